@@ -0,0 +1,151 @@
+# benchmarks/bench_queries.py
+# บันทึกแผนการ query (EXPLAIN) และเวลาของเส้นทางหลักกับฐานข้อมูลจริง เพื่อเทียบก่อน/หลังเพิ่ม index
+#
+#   python benchmarks/bench_queries.py --label before
+#   python manage.py migrate
+#   python benchmarks/bench_queries.py --label after
+#
+# แต่ละสถานการณ์เรียกฟังก์ชันเดียวกับที่ route ใช้ ดักทุก SQL ที่ยิงออกไป แล้วรัน EXPLAIN ของ statement เหล่านั้น
+# (SQLite: EXPLAIN QUERY PLAN, PostgreSQL: EXPLAIN ANALYZE)
+# ผลลัพธ์เป็น JSON (ค่าเริ่มต้น benchmarks/results/queries_<label>_<เวลา>.json)
+import argparse, json, os, statistics, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def pick_sample(db, models):
+    """ เลือกนักเรียนที่มีคะแนนมากที่สุดและบทเรียนของเกมที่เล่น เป็นตัวแทนข้อมูลจริง """
+    GameScore, Game, User = models.GameScore, models.Game, models.User
+    row = (
+        db.session.query(GameScore.user_id, db.func.count(GameScore.id).label("n"))
+        .group_by(GameScore.user_id)
+        .order_by(db.desc("n"))
+        .first()
+    )
+    if row is None:
+        sys.exit("❌ ยังไม่มีข้อมูล GameScore ในฐานข้อมูลนี้")
+    user = User.query.get(row.user_id)
+    game = (
+        Game.query.join(GameScore, GameScore.game_id == Game.id)
+        .filter(GameScore.user_id == user.id)
+        .first()
+    )
+    return user, game
+
+
+def scenarios(db, models, user, game):
+    from utils import score_loader
+    from utils.leaderboard import get_ranking
+
+    lesson_ids = [l.id for l in models.Lesson.query.filter_by(lang=game.lang).all()]
+    games = models.Game.query.filter_by(lesson_id=game.lesson_id).all()
+    speech_ids = [q.id for q in models.SpeechQuestion.query.all()][:50]
+
+    return {
+        "save_game_score.lookup": lambda: models.GameScore.query.filter_by(user_id=user.id, game_id=game.id).first(),
+        "unit_detail": lambda: score_loader.unit_overview(user.id, game.lesson_id),
+        "lesson_score_detail": lambda: (
+            score_loader.latest_score_by_game(user.id, [g.id for g in games]),
+            score_loader.item_counts(games),
+        ),
+        "score_dashboard": lambda: (
+            score_loader.best_score_by_lesson(user.id, lesson_ids),
+            score_loader.quiz_scores_by_lesson(user.id, lesson_ids),
+        ),
+        "quiz_game.questions": lambda: models.Exercise.query.filter_by(
+            lesson_id=game.lesson_id, question_type="game", lang=game.lang
+        ).all(),
+        "quiz.pre_done": lambda: models.QuizResult.query.filter_by(
+            user_id=user.id, lesson_id=game.lesson_id, test_type="pre"
+        ).first(),
+        "speech_finish.results": lambda: models.SpeechResult.query.filter(
+            models.SpeechResult.user_id == user.id, models.SpeechResult.question_id.in_(speech_ids or [0])
+        ).all(),
+        "teacher_ranking": lambda: get_ranking(user.school) if user.school else None,
+    }
+
+
+def explain_prefix(dialect):
+    return {
+        "sqlite": "EXPLAIN QUERY PLAN ",
+        "postgresql": "EXPLAIN (ANALYZE, BUFFERS) ",
+        "mysql": "EXPLAIN ",
+    }.get(dialect, "EXPLAIN ")
+
+
+def run(args):
+    from sqlalchemy import event
+    from app import app
+    import models
+    from models import db
+
+    with app.app_context():
+        engine = db.engine
+        user, game = pick_sample(db, models)
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        report = []
+        for name, fn in scenarios(db, models, user, game).items():
+            db.session.expire_all()
+            captured.clear()
+            event.listen(engine, "before_cursor_execute", capture)
+            try:
+                fn()
+            finally:
+                event.remove(engine, "before_cursor_execute", capture)
+            statements = list(captured)
+
+            timings = []
+            for _ in range(args.repeat):
+                db.session.expire_all()
+                start = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            plans = []
+            with engine.connect() as conn:
+                for statement, parameters in statements:
+                    rows = conn.exec_driver_sql(explain_prefix(engine.dialect.name) + statement, parameters).fetchall()
+                    plans.append({"sql": statement, "plan": [" | ".join(map(str, r)) for r in rows]})
+
+            report.append({
+                "scenario": name,
+                "queries": len(statements),
+                "median_ms": round(statistics.median(timings), 2),
+                "p95_ms": round(sorted(timings)[min(len(timings) - 1, int(0.95 * len(timings)))], 2),
+                "plans": plans,
+            })
+            print(f"⏱️  {name}: {len(statements)} query, {report[-1]['median_ms']} ms", file=sys.stderr)
+
+        return {
+            "label": args.label,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "dialect": engine.dialect.name,
+            "sample": {"user_id": user.id, "game_id": game.id, "lesson_id": game.lesson_id},
+            "results": report,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EchoLingo hot-path query plans and timings")
+    parser.add_argument("--label", default="run", help="เช่น before / after")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    report = run(args)
+    out_path = args.out or os.path.join(
+        ROOT, "benchmarks", "results", f"queries_{args.label}_" + time.strftime("%Y%m%d_%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ บันทึกผลที่ {out_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
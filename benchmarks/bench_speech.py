@@ -0,0 +1,178 @@
+# benchmarks/bench_speech.py
+# วัดประสิทธิภาพ pipeline ตรวจเสียง (ถอดรหัส → VAD → ASR → similarity) แบบเดียวกับ speech_upload
+# โดยไม่รวมการบันทึกฐานข้อมูล
+#
+#   python benchmarks/bench_speech.py                                  # backend ตาม config
+#   python benchmarks/bench_speech.py --backends whisper,faster-whisper --concurrency 1,2,4,8
+#   python benchmarks/bench_speech.py --clips-dir my_recordings/        # ใช้ไฟล์เสียงจริง (ชื่อไฟล์ขึ้นต้นด้วย en_ / zh_)
+#
+# คลิปสังเคราะห์สร้างจาก espeak-ng (offline) แล้วแปลงเป็น WebM/Opus เหมือนที่เบราว์เซอร์ส่งมา
+# แต่ละ backend รันใน process แยก เพื่อให้เวลาโหลดโมเดลและ peak RSS ไม่ปนกัน
+# ผลลัพธ์เป็น JSON (ค่าเริ่มต้น benchmarks/results/<เวลา>.json) สำหรับเทียบข้ามรุ่น
+import argparse, json, os, platform, resource, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PHRASES = {
+    "en": [
+        "Good morning, how are you today?",
+        "I like to read books after school.",
+        "Can you help me find the library?",
+        "My favourite colour is blue.",
+        "We are going to the park tomorrow.",
+    ],
+    "zh": [
+        "你好，你今天怎么样？",
+        "我喜欢放学后看书。",
+        "请问图书馆在哪里？",
+        "我最喜欢的颜色是蓝色。",
+        "我们明天去公园。",
+    ],
+}
+ESPEAK_VOICES = {"en": "en-us", "zh": "cmn"}
+
+
+def synth_clip(text, lang):
+    """ สร้างคลิป WebM/Opus จาก espeak-ng (เติมเงียบหัวท้ายให้ใกล้เคียงการอัดจริง) """
+    wav = subprocess.run(
+        ["espeak-ng", "-v", ESPEAK_VOICES[lang], "--stdout", text],
+        capture_output=True, check=True
+    ).stdout
+    return subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+         "-af", "adelay=800:all=1,apad=pad_dur=1.2",
+         "-c:a", "libopus", "-b:a", "32k", "-f", "webm", "pipe:1"],
+        input=wav, capture_output=True, check=True
+    ).stdout
+
+
+def load_clips(clips_dir=None):
+    clips = []
+    if clips_dir:
+        for name in sorted(os.listdir(clips_dir)):
+            lang = name.split("_", 1)[0]
+            if lang in PHRASES:
+                with open(os.path.join(clips_dir, name), "rb") as f:
+                    clips.append({"lang": lang, "text": None, "audio": f.read(), "name": name})
+        return clips
+    for lang, phrases in PHRASES.items():
+        for i, text in enumerate(phrases):
+            clips.append({"lang": lang, "text": text, "audio": synth_clip(text, lang), "name": f"{lang}_{i}"})
+    return clips
+
+
+def percentiles(samples):
+    data = sorted(samples)
+    pick = lambda p: data[min(len(data) - 1, int(p * len(data)))]
+    return {
+        "n": len(data),
+        "p50_ms": round(pick(0.50) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "p99_ms": round(pick(0.99) * 1000, 1),
+        "max_ms": round(data[-1] * 1000, 1),
+    }
+
+
+def run_backend(args):
+    """ วัดผล backend เดียวใน process นี้ แล้วพิมพ์ JSON ออก stdout """
+    from config import Config
+    Config.ASR_BACKEND = args.backend
+    Config.INFERENCE_URL = None  # วัดโมเดลใน process นี้โดยตรง
+    from utils import nlp_utils
+    from utils.asr import loaded_backends
+
+    clips = load_clips(args.clips_dir)
+    reference = {c["name"]: c["text"] or "" for c in clips}
+
+    t0 = time.time()
+    for lang in sorted({c["lang"] for c in clips}):
+        nlp_utils.get_asr(lang)
+    nlp_utils.get_embedder(Config.SPEECH_EMBED_MODEL)
+    load_s = time.time() - t0
+
+    def score(clip):
+        # ปิดผล cache เพื่อวัดงานจริงทุกครั้ง
+        nlp_utils.transcript_cache.clear()
+        nlp_utils.similarity_cache.clear()
+        start = time.perf_counter()
+        text = nlp_utils.transcribe_audio(clip["audio"], lang=clip["lang"])
+        nlp_utils.reference_similarity(text, reference[clip["name"]], model=Config.SPEECH_EMBED_MODEL)
+        return time.perf_counter() - start
+
+    for clip in clips[:2]:  # warm-up
+        score(clip)
+
+    latencies = [score(c) for _ in range(args.repeat) for c in clips]
+
+    throughput = []
+    for workers in args.concurrency:
+        jobs = clips * max(1, args.repeat)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            lat = list(pool.map(score, jobs))
+        elapsed = time.perf_counter() - start
+        throughput.append({
+            "concurrency": workers,
+            "clips_per_s": round(len(jobs) / elapsed, 2),
+            **percentiles(lat),
+        })
+
+    return {
+        "backend": args.backend,
+        "models": loaded_backends(),
+        "batch_size": Config.ASR_BATCH_SIZE,
+        "vad": Config.VAD_ENABLED,
+        "model_load_s": round(load_s, 2),
+        "latency": percentiles(latencies),
+        "throughput": throughput,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EchoLingo speech pipeline benchmark")
+    parser.add_argument("--backends", default=None, help="เช่น whisper,faster-whisper (ค่าเริ่มต้นตาม ASR_BACKEND)")
+    parser.add_argument("--concurrency", default="1,2,4,8")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--clips-dir")
+    parser.add_argument("--out")
+    parser.add_argument("--backend", help=argparse.SUPPRESS)  # ใช้ภายใน: รัน backend เดียว
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    if args.backend:
+        print(json.dumps(run_backend(args)))
+        return
+
+    from config import Config
+    backends = (args.backends or Config.ASR_BACKEND).split(",")
+    results = []
+    for backend in backends:
+        cmd = [sys.executable, os.path.abspath(__file__), "--backend", backend,
+               "--concurrency", ",".join(map(str, args.concurrency)), "--repeat", str(args.repeat)]
+        if args.clips_dir:
+            cmd += ["--clips-dir", args.clips_dir]
+        print(f"⏱️  {backend} ...", file=sys.stderr)
+        out = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+        if out.returncode != 0:
+            results.append({"backend": backend, "error": out.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    out_path = args.out or os.path.join(ROOT, "benchmarks", "results", time.strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"✅ บันทึกผลที่ {out_path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
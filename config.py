@@ -11,3 +11,68 @@ class Config:
     SQLALCHEMY_ENGINE_OPTIONS = {
         "connect_args": {"options": "-c timezone=Asia/Bangkok"}
     }
+
+    # 🎤 คิวงานตรวจเสียง (speech_upload แบบ async)
+    SPEECH_WORKERS = int(os.getenv('SPEECH_WORKERS', 2))
+    SPEECH_QUEUE_SIZE = int(os.getenv('SPEECH_QUEUE_SIZE', 64))
+    SPEECH_RESULT_TTL = int(os.getenv('SPEECH_RESULT_TTL', 300))
+
+    # 🧠 โมเดล AI (ถ้าตั้ง INFERENCE_URL จะเรียก inference_server.py แทนการโหลดโมเดลใน worker)
+    WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')
+    # ASR_BACKEND: 'whisper' (openai-whisper, PyTorch) หรือ 'faster-whisper' (CTranslate2 int8 บน CPU)
+    ASR_BACKEND = os.getenv('ASR_BACKEND', 'whisper')
+    ASR_COMPUTE_TYPE = os.getenv('ASR_COMPUTE_TYPE', 'int8')
+    ASR_MODEL_EN = os.getenv('ASR_MODEL_EN', WHISPER_MODEL)
+    ASR_MODEL_ZH = os.getenv('ASR_MODEL_ZH', WHISPER_MODEL)
+    EMBED_MODEL = os.getenv('EMBED_MODEL', 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2')
+    SPEECH_EMBED_MODEL = os.getenv('SPEECH_EMBED_MODEL', 'paraphrase-MiniLM-L6-v2')
+    INFERENCE_URL = os.getenv('INFERENCE_URL')
+    INFERENCE_TIMEOUT = int(os.getenv('INFERENCE_TIMEOUT', 60))
+    TRANSCRIPT_CACHE_SIZE = int(os.getenv('TRANSCRIPT_CACHE_SIZE', 1024))
+    TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', 3600))
+    EMBED_CACHE_DIR = os.getenv('EMBED_CACHE_DIR', os.path.join('instance', 'embedding_cache'))
+
+    # 🎧 micro-batching ของ Whisper (1 = ปิด, ถอดเสียงทีละคลิป)
+    ASR_BATCH_SIZE = int(os.getenv('ASR_BATCH_SIZE', 1))
+    ASR_BATCH_WAIT_MS = int(os.getenv('ASR_BATCH_WAIT_MS', 50))
+
+    # 📡 เกมพูดแบบสตรีม (WebSocket /game/speech_stream)
+    SPEECH_STREAM_INTERVAL_MS = int(os.getenv('SPEECH_STREAM_INTERVAL_MS', 700))
+    SPEECH_STREAM_WINDOW_S = int(os.getenv('SPEECH_STREAM_WINDOW_S', 30))
+
+    # 🔇 ตัดช่วงเงียบ (VAD) ก่อนส่งเข้า Whisper
+    VAD_ENABLED = os.getenv('VAD_ENABLED', '1') == '1'
+    VAD_MAX_SPEECH_S = int(os.getenv('VAD_MAX_SPEECH_S', 30))
+
+    # 🔢 ดัชนีจำนวนข้อของเกม (วินาทีที่ cache ใน worker ก่อนอ่านจากตารางอีกครั้ง)
+    ITEM_COUNT_CACHE_TTL = int(os.getenv('ITEM_COUNT_CACHE_TTL', 60))
+
+    # 📚 cache เนื้อหา (บทเรียน / เกม / ข้อ) — CONTENT_CACHE_URL=redis://... เพื่อใช้ cache กลางร่วมกันทุก worker
+    CONTENT_CACHE_URL = os.getenv('CONTENT_CACHE_URL')
+    CONTENT_CACHE_SIZE = int(os.getenv('CONTENT_CACHE_SIZE', 2048))
+    CONTENT_CACHE_TTL = int(os.getenv('CONTENT_CACHE_TTL', 3600))
+    CONTENT_VERSION_CHECK_S = float(os.getenv('CONTENT_VERSION_CHECK_S', 1.0))
+
+    # 🖼️ รูปคำถาม: ความกว้างของไฟล์ย่อ (px) ที่สร้างตอนอัปโหลด / python manage.py build-image-variants
+    IMAGE_WIDTHS = [int(w) for w in os.getenv('IMAGE_WIDTHS', '160,320,640,1024').split(',')]
+    IMAGE_MANIFEST_TTL = int(os.getenv('IMAGE_MANIFEST_TTL', 300))
+
+    # 🔊 เสียงข้อจับคู่ที่อัปโหลด: 'aac' (.m4a เล่นได้ทุกเบราว์เซอร์) หรือ 'opus' (.webm ไฟล์เล็กกว่า)
+    AUDIO_FORMAT = os.getenv('AUDIO_FORMAT', 'aac')
+
+    # 🗣️ เสียงอ่านคำศัพท์ฝั่งเซิร์ฟเวอร์ (espeak-ng) สำหรับเกมลากวาง / จับคู่
+    TTS_ENGINE = os.getenv('TTS_ENGINE', 'espeak-ng')
+    TTS_VOICE_EN = os.getenv('TTS_VOICE_EN', 'en-us')
+    TTS_VOICE_ZH = os.getenv('TTS_VOICE_ZH', 'cmn')
+    TTS_SPEED = int(os.getenv('TTS_SPEED', 140))
+    TTS_TIMEOUT = int(os.getenv('TTS_TIMEOUT', 10))   # วินาที ต่อขั้น (espeak-ng / ffmpeg)
+
+    # 📦 การส่งไฟล์สื่อ / CSS (ETag, Range, Cache-Control)
+    # MEDIA_ACCEL: '' = Flask ส่งเอง, 'nginx' = X-Accel-Redirect, 'sendfile' = X-Sendfile (Apache / lighttpd)
+    MEDIA_ACCEL = os.getenv('MEDIA_ACCEL', '').lower()
+    MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/_protected/static/')
+    MEDIA_ACCEL_ROOT = os.getenv('MEDIA_ACCEL_ROOT', 'static')
+    USE_X_SENDFILE = MEDIA_ACCEL == 'sendfile'
+    UPLOAD_MAX_AGE = int(os.getenv('UPLOAD_MAX_AGE', 3600))
+    STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', 3600))
+    SEND_FILE_MAX_AGE_DEFAULT = STATIC_MAX_AGE
@@ -0,0 +1,119 @@
+# inference_server.py
+# เซิร์ฟเวอร์โมเดล (ASR + SentenceTransformer) หนึ่งตัวต่อเครื่อง
+# web worker ทุกตัวเรียกผ่าน utils/inference_client.py แทนการโหลดโมเดลเอง
+#
+#   python inference_server.py                          # http://127.0.0.1:8765
+#   python inference_server.py --unix /run/echolingo/inference.sock
+#
+# แล้วตั้ง INFERENCE_URL=http://127.0.0.1:8765 (หรือ unix:///run/echolingo/inference.sock) ให้ Flask
+import argparse, json, os, socketserver, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from config import Config
+from utils import nlp_utils
+from utils.asr import loaded_backends
+from utils.vad import vad_stats
+
+# Whisper ถูก serialize/batch อยู่ใน nlp_utils แล้ว ส่วน embedder ใช้ lock แยก
+_embed_lock = threading.Lock()
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    server_version = "EchoLingoInference/1.0"
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_GET(self):
+        if urlsplit(self.path).path == "/health":
+            return self._reply(200, {"ok": True, "uptime": round(time.time() - self.server.started_at, 1)})
+        if urlsplit(self.path).path == "/stats":
+            stats = {"asr": loaded_backends(), "vad": vad_stats(), "cache": nlp_utils.cache_stats()}
+            if Config.ASR_BATCH_SIZE > 1:
+                stats["batcher"] = nlp_utils.get_batcher().stats()
+            return self._reply(200, stats)
+        self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path == "/transcribe":
+                lang = parse_qs(url.query).get("lang", ["en"])[0]
+                return self._reply(200, {"text": self._transcribe(self._body(), lang)})
+            if url.path == "/similarity":
+                data = json.loads(self._body() or b"{}")
+                with _embed_lock:
+                    score = nlp_utils.local_similarity(data.get("text1", ""), data.get("text2", ""), data.get("model"))
+                return self._reply(200, {"score": score})
+            if url.path == "/reference_similarity":
+                data = json.loads(self._body() or b"{}")
+                with _embed_lock:
+                    score = nlp_utils.local_reference_similarity(data.get("transcript", ""), data.get("reference", ""), data.get("model"))
+                return self._reply(200, {"score": score})
+            if url.path == "/reference":
+                data = json.loads(self._body() or b"{}")
+                with _embed_lock:
+                    if data.get("action") == "drop":
+                        nlp_utils.get_reference_cache().invalidate(nlp_utils._normalize(data.get("text")), data.get("model") or Config.EMBED_MODEL)
+                    else:
+                        nlp_utils.warm_reference(data.get("text", ""), data.get("model"))
+                return self._reply(200, {"ok": True})
+        except Exception as e:
+            return self._reply(500, {"error": str(e)})
+        self._reply(404, {"error": "not found"})
+
+    def _transcribe(self, body, lang):
+        # ถอดรหัสในหน่วยความจำ ไม่เขียนไฟล์ชั่วคราว
+        if self.headers.get("Content-Type", "").startswith("audio/x-f32le"):
+            import numpy as np
+            return nlp_utils.local_transcribe(np.frombuffer(body, np.float32), lang)
+        return nlp_utils.local_transcribe(body, lang)
+
+    def address_string(self):
+        # unix socket ไม่มี client_address
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EchoLingo model inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path ของ unix socket (ใช้แทน host/port)")
+    args = parser.parse_args()
+
+    t0 = time.time()
+    nlp_utils.get_asr("en")
+    nlp_utils.get_asr("zh")
+    nlp_utils.get_embedder(Config.EMBED_MODEL)
+    nlp_utils.get_embedder(Config.SPEECH_EMBED_MODEL)
+    print(f"✅ โหลดโมเดลเสร็จใน {time.time() - t0:.1f}s")
+
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = ThreadingUnixHTTPServer(args.unix, InferenceHandler)
+        where = f"unix://{args.unix}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), InferenceHandler)
+        where = f"http://{args.host}:{args.port}"
+
+    server.started_at = time.time()
+    print(f"🚀 inference server พร้อมที่ {where}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
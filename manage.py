@@ -0,0 +1,144 @@
+# manage.py — คำสั่งดูแลระบบ
+#   python manage.py rebuild-leaderboard
+#   python manage.py rebuild-item-counts
+#   python manage.py migrate
+#   python manage.py check-indexes
+#   python manage.py build-image-variants [--force]
+#   python manage.py import-media
+#   python manage.py gc-media [--dry-run]
+#   python manage.py compress-static
+#   python manage.py transcode-audio [--force]
+#   python manage.py prerender-tts [--prune]
+import argparse, sys
+from app import app
+
+
+def rebuild_leaderboard(args):
+    from utils.leaderboard import rebuild
+    count = rebuild()
+    print(f"✅ คำนวณตารางอันดับใหม่แล้ว ({count} แถว)")
+
+
+def rebuild_item_counts(args):
+    from utils.item_index import rebuild
+    count = rebuild()
+    print(f"✅ นับจำนวนข้อของเกมใหม่แล้ว ({count} เกม)")
+
+
+def migrate(args):
+    from utils.migrations import upgrade
+    from utils.content_cache import content_changed
+    ran = upgrade()
+    if ran:
+        content_changed()  # migration อาจแก้เนื้อหา → ให้ cache ทุก worker โหลดใหม่
+    for migration_id in ran:
+        print(f"✅ {migration_id}")
+    if not ran:
+        print("✅ ฐานข้อมูลเป็นเวอร์ชันล่าสุดแล้ว")
+
+
+def check_indexes(args):
+    from utils.migrations import missing_indexes, pending
+    for migration_id, description, _ in pending():
+        print(f"⏳ ยังไม่ได้รัน migration {migration_id}: {description}")
+    missing = missing_indexes()
+    for table, name, columns in missing:
+        print(f"⚠️ {table}: ไม่มี index {name} ({', '.join(columns)})")
+    if missing:
+        print("👉 รัน python manage.py migrate เพื่อสร้าง index ที่ขาด")
+        sys.exit(1)
+    print("✅ index ของเส้นทางหลักครบ")
+
+
+def build_image_variants(args):
+    from utils.images import convert_all
+    count, original, variants = convert_all(force=args.force)
+    print(f"✅ สร้างไฟล์ย่อแล้ว {count} รูป: ต้นฉบับ {original / 1e6:.1f} MB → WebP ขนาดใหญ่สุด {variants / 1e6:.1f} MB")
+
+
+def _image_variant_args(parser):
+    parser.add_argument("--force", action="store_true", help="สร้างใหม่แม้มีไฟล์ย่ออยู่แล้ว")
+
+
+def import_media(args):
+    from utils.media_store import import_legacy
+    from utils.content_cache import content_changed
+    updated, missing = import_legacy()
+    content_changed()
+    print(f"✅ ย้ายเข้า media store แล้ว {updated} แถว (ไม่พบไฟล์ {missing} แถว)")
+
+
+def gc_media(args):
+    from utils.media_store import gc
+    removed = gc(dry_run=args.dry_run)
+    for path in removed:
+        print(("🔎 " if args.dry_run else "🗑️ ") + path)
+    print(f"✅ ไฟล์ที่ไม่มีใครใช้: {len(removed)} ไฟล์" + (" (ยังไม่ได้ลบ)" if args.dry_run else ""))
+
+
+def _gc_media_args(parser):
+    parser.add_argument("--dry-run", action="store_true", help="แสดงรายการโดยไม่ลบ")
+
+
+def compress_static(args):
+    from utils.media_serving import precompress
+    count = precompress("static/css")
+    print(f"✅ บีบอัด CSS ไว้ล่วงหน้าแล้ว {count} ไฟล์ (.gz และ .br ถ้าติดตั้ง brotli)")
+
+
+def transcode_audio(args):
+    from utils.audio import transcode_existing
+    from utils.content_cache import content_changed
+    converted, skipped = transcode_existing(force=args.force)
+    if converted:
+        content_changed()
+    print(f"✅ แปลงเสียงข้อจับคู่แล้ว {converted} ไฟล์ (ข้าม {skipped} ไฟล์ที่อ่าน/แปลงไม่ได้)")
+
+
+def _transcode_audio_args(parser):
+    parser.add_argument("--force", action="store_true", help="แปลงใหม่แม้ไฟล์ผ่านการแปลงแล้ว")
+
+
+def prerender_tts(args):
+    from utils.tts import prerender_all, prune
+    from utils.content_cache import content_changed
+    created, failed = prerender_all()
+    removed = prune() if args.prune else 0
+    if created or removed:
+        content_changed()  # payload ของเกมเก็บรายการเสียงไว้ → ให้โหลดใหม่
+    print(f"✅ สร้างเสียงอ่านใหม่ {created} ข้อความ (สร้างไม่ได้ {failed}, ลบที่ไม่ใช้แล้ว {removed})")
+
+
+def _prerender_tts_args(parser):
+    parser.add_argument("--prune", action="store_true", help="ลบเสียงของข้อความที่ไม่มีข้อไหนใช้แล้ว")
+
+
+COMMANDS = {
+    "rebuild-leaderboard": (rebuild_leaderboard, "คำนวณตาราง leaderboard_total ใหม่ทั้งหมดจาก GameScore"),
+    "rebuild-item-counts": (rebuild_item_counts, "คำนวณดัชนีจำนวนข้อ game_item_count ใหม่ทั้งหมด"),
+    "migrate": (migrate, "รัน migration ที่ยังไม่ได้รัน (ตาราง + index)"),
+    "check-indexes": (check_indexes, "ตรวจว่า index ของเส้นทางหลักมีครบ (exit 1 ถ้าขาด)"),
+    "build-image-variants": (build_image_variants, "สร้างไฟล์ย่อ WebP/AVIF + placeholder ของรูปที่มีอยู่แล้ว", _image_variant_args),
+    "import-media": (import_media, "ย้ายไฟล์สื่อที่อ้างถึงแบบเดิมเข้า media store (รวมไฟล์ซ้ำ)"),
+    "gc-media": (gc_media, "นับการใช้งานไฟล์ใน media store ใหม่ แล้วลบไฟล์ที่ไม่มีใครใช้", _gc_media_args),
+    "compress-static": (compress_static, "สร้างไฟล์ .gz / .br ของ CSS ไว้ส่งแทนไฟล์เต็ม"),
+    "transcode-audio": (transcode_audio, "ตัดเงียบ + ปรับความดัง + บีบอัดเสียงข้อจับคู่ที่มีอยู่แล้ว", _transcode_audio_args),
+    "prerender-tts": (prerender_tts, "สร้างเสียงอ่าน (espeak-ng) ของคำในเกมลากวาง / จับคู่ที่ยังไม่มี", _prerender_tts_args),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EchoLingo management commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text, *add_args) in COMMANDS.items():
+        command = sub.add_parser(name, help=help_text)
+        if add_args:
+            add_args[0](command)
+    args = parser.parse_args()
+
+    with app.app_context():
+        COMMANDS[args.command][0](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ from .teacher import teacher_bp
 from .student import student_bp
 from .game import game_bp
 from .admin_quiz import admin_quiz_bp
+from .media import media_bp
+
+# ผูก index ของเส้นทางหลัก / ตารางเสริมเข้ากับ metadata ทันทีที่แอป import routes
+# → db.create_all() ที่เรียกหลังจากนี้สร้างให้ด้วย (ฐานข้อมูลเดิมใช้ python manage.py migrate)
+import utils.migrations  # noqa: F401
 
 def register_blueprints(app):
     app.register_blueprint(auth_bp)
@@ -12,3 +17,4 @@ def register_blueprints(app):
     app.register_blueprint(student_bp)
     app.register_blueprint(game_bp)
     app.register_blueprint(admin_quiz_bp)
+    app.register_blueprint(media_bp)
@@ -6,6 +6,14 @@ from models import (
     ScrambleItem, FillInBlank, SpeechQuestion
 )
 from werkzeug.utils import secure_filename
+from config import Config
+from utils.nlp_utils import warm_reference, invalidate_reference
+from utils.canonical import canonical_lang, canonical_test_type
+from utils.item_index import refresh_game, refresh_lesson_quizzes, drop_game
+from utils.images import save_upload
+from utils.audio import save_audio_upload
+from utils import tts
+from utils import media_store
 import os
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
@@ -15,6 +23,7 @@ def admin_only():
         return False
     return True
 
+
 @admin_bp.route("/dashboard")
 @login_required
 def dashboard():
@@ -83,6 +92,9 @@ def delete_lesson(lesson_id):
     if not admin_only():
         return redirect("/")
     lesson = Lesson.query.get_or_404(lesson_id)
+    game_ids = [g.id for g in Game.query.filter_by(lesson_id=lesson.id).all()]
+    # ข้อของบทเรียนถูกลบด้วย cascade ในฐานข้อมูล (ORM ไม่เห็นแถวเหล่านี้) → จดพาธสื่อไว้ให้ sync ตอน commit
+    media_store.track(*media_store.referenced_paths(game_ids=game_ids, lesson_ids=[lesson.id]))
     db.session.delete(lesson)
     db.session.commit()
     flash("🗑️ ลบบทเรียนเรียบร้อย", "success")
@@ -110,7 +122,7 @@ def add_game():
         description = request.form["description"]
         game_type = request.form["game_type"].strip().lower()
         lesson_id = request.form["lesson_id"]
-        lang = request.form["lang"] or "en"
+        lang = canonical_lang(request.form["lang"])
 
         # ✅ บังคับให้ "เกมพูด" ใช้ชื่อ game_type = 'speech'
         if game_type in ["speaking", "พูด", "พูดคุย", "speaking game"]:
@@ -142,6 +154,7 @@ def edit_game(game_id):
         game.lesson_id = int(request.form['lesson_id'])
         game.title_pinyin = request.form.get('title_pinyin')
         game.description_pinyin = request.form.get('description_pinyin')
+        refresh_game(game.id)
         db.session.commit()
         flash('✅ แก้ไขข้อมูลเกมเรียบร้อยแล้ว')
         return redirect(url_for('admin.view_game_detail', game_id=game_id))
@@ -158,6 +171,9 @@ def delete_game(game_id):
         return redirect("/")
     game = Game.query.get_or_404(game_id)
     lesson_id = game.lesson_id  # ✅ จำบทก่อนลบ
+    # ข้อของเกมถูกลบด้วย cascade ในฐานข้อมูล (ORM ไม่เห็นแถวเหล่านี้) → จดพาธสื่อไว้ให้ sync ตอน commit
+    media_store.track(*media_store.referenced_paths(game_ids=[game.id]))
+    drop_game(game.id)
     db.session.delete(game)
     db.session.commit()
     flash("🗑️ ลบเกมเรียบร้อย", "success")
@@ -187,8 +203,8 @@ def add_exercise():
         question = request.form["question"]
         correct_option = request.form["correct_option"]
         lesson_id = request.form["lesson_id"]
-        question_type = request.form["question_type"]
-        lang = request.form["lang"]
+        question_type = canonical_test_type(request.form["question_type"])
+        lang = canonical_lang(request.form["lang"])
 
         new_ex = Exercise(
             question=question,
@@ -198,6 +214,7 @@ def add_exercise():
             lang=lang
         )
         db.session.add(new_ex)
+        refresh_lesson_quizzes(lesson_id)
         db.session.commit()
         flash("✅ เพิ่มแบบฝึกหัดสำเร็จ", "success")
         return redirect(url_for("admin.manage_exercises"))
@@ -212,11 +229,14 @@ def edit_exercise(exercise_id):
     exercise = Exercise.query.get_or_404(exercise_id)
     lessons = Lesson.query.all()
     if request.method == "POST":
+        old_lesson_id = exercise.lesson_id
         exercise.question = request.form["question"]
         exercise.correct_option = request.form["correct_option"]
         exercise.lesson_id = request.form["lesson_id"]
-        exercise.question_type = request.form["question_type"]
-        exercise.lang = request.form["lang"]
+        exercise.question_type = canonical_test_type(request.form["question_type"])
+        exercise.lang = canonical_lang(request.form["lang"])
+        refresh_lesson_quizzes(old_lesson_id)
+        refresh_lesson_quizzes(exercise.lesson_id)
         db.session.commit()
         flash("✏️ แก้ไขแบบฝึกหัดเรียบร้อย", "success")
         return redirect(url_for("admin.manage_exercises"))
@@ -230,6 +250,7 @@ def delete_exercise(exercise_id):
         return redirect("/")
     exercise = Exercise.query.get_or_404(exercise_id)
     db.session.delete(exercise)
+    refresh_lesson_quizzes(exercise.lesson_id)
     db.session.commit()
     flash("🗑️ ลบแบบฝึกหัดเรียบร้อย", "success")
     return redirect(url_for("admin.manage_exercises"))
@@ -374,30 +395,17 @@ def add_matching_item(game_id):
         answer_text = request.form.get("answer_text")
         pair_group = request.form.get("pair_group")
 
-        audio_path = None
-
-        # ✅ ตรวจสอบการอัปโหลดไฟล์เสียง
-        if audio_file and audio_file.filename != "":
-            filename = secure_filename(audio_file.filename)
-
-            # ✅ ตั้งชื่อไฟล์ไม่ให้ซ้ำ เช่น matching_41_20251022_123456.mp3
-            import datetime
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            ext = filename.rsplit(".", 1)[-1]
-            new_filename = f"matching_{game_id}_{timestamp}.{ext}"
-
-            upload_folder = os.path.join("static", "uploads")
-            os.makedirs(upload_folder, exist_ok=True)
-            audio_file.save(os.path.join(upload_folder, new_filename))
-
-            # ✅ เก็บพาธสำหรับใช้ url_for('admin.serve_upload')
-            audio_path = f"uploads/{new_filename}"
-
-        # ✅ ตรวจสอบข้อมูล
+        # ✅ ตรวจสอบข้อมูล (ก่อนบันทึกไฟล์)
         if not answer_text or not pair_group:
             flash("⚠️ กรุณากรอกข้อมูลให้ครบ", "warning")
             return redirect(request.url)
 
+        audio_path = None
+
+        # ✅ ตัดเงียบ + ปรับความดัง + บีบอัด แล้วเก็บใน media store (ชื่อตาม hash — ไฟล์ซ้ำเก็บครั้งเดียว)
+        if audio_file and audio_file.filename != "":
+            audio_path = save_audio_upload(audio_file)
+
         new_item = MatchingItem(
             game_id=game.id,
             lesson_id=game.lesson_id,
@@ -407,6 +415,8 @@ def add_matching_item(game_id):
         )
 
         db.session.add(new_item)
+        tts.schedule(answer_text, game.lang)  # 🗣️ เสียงอ่านสำรองเมื่อไม่มีไฟล์เสียง (สร้างหลัง commit)
+        refresh_game(game_id)
         db.session.commit()
         flash("✅ เพิ่มข้อจับคู่พร้อมเสียงเรียบร้อย", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game.id))
@@ -433,16 +443,15 @@ def edit_matching_item(game_id, item_id):
         # ✅ ถ้ามีการอัปโหลดไฟล์ใหม่
         audio_file = request.files.get("question_audio")
         if audio_file and audio_file.filename:
-            from werkzeug.utils import secure_filename
-            filename = secure_filename(audio_file.filename)
-            upload_folder = os.path.join("static", "uploads")
-            os.makedirs(upload_folder, exist_ok=True)
-            audio_file.save(os.path.join(upload_folder, filename))
-            item.question_audio = f"uploads/{filename}"
+            item.question_audio = save_audio_upload(audio_file)
 
         # ✅ อัปเดตข้อมูลอื่น
+        old_text = item.answer_text
         item.answer_text = answer_text
         item.pair_group = pair_group
+        if (old_text or "").strip() != (answer_text or "").strip():
+            tts.release(old_text, game.lang)
+            tts.schedule(answer_text, game.lang)
 
         db.session.commit()
         flash("✅ แก้ไขคำถามจับคู่เรียบร้อยแล้ว", "success")
@@ -461,10 +470,12 @@ def delete_matching_item(game_id, item_id):
 
     item = MatchingItem.query.get_or_404(item_id)
     db.session.delete(item)
+    tts.release(item.answer_text, Game.query.get_or_404(game_id).lang)
+    refresh_game(game_id)
     db.session.commit()
 
     flash("🗑️ ลบข้อจับคู่เรียบร้อยแล้ว", "success")
-    return redirect(url_for("game_detail_matching.html", game_id=game_id))
+    return redirect(url_for("admin.view_game_detail", game_id=game_id))
 # ------------------------------------------------------------
 # 🧩 เพิ่ม / ลบ / แก้ไข ข้อในเกมประเภท Drag & Drop
 # ------------------------------------------------------------
@@ -493,6 +504,8 @@ def add_game_item(game_id):
             image_name=image_name
         )
         db.session.add(new_item)
+        tts.schedule(word, game.lang)  # 🗣️ เสียงอ่านคำศัพท์ (หน้าเกมไม่ต้องพึ่ง speechSynthesis)
+        refresh_game(game_id)
         db.session.commit()
         flash("✅ เพิ่มคำศัพท์ใหม่เรียบร้อย", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game_id))
@@ -501,19 +514,38 @@ def add_game_item(game_id):
 
 
 
-@admin_bp.route("/game/<int:game_id>/edit_game_item/<int:item_id>", methods=["POST"])
+@admin_bp.route("/game/<int:game_id>/edit_game_item/<int:item_id>", methods=["GET", "POST"])
 @login_required
 def edit_game_item(game_id, item_id):
     if not admin_only():
         return redirect("/")
 
+    game = Game.query.get_or_404(game_id)
     item = GameItem.query.get_or_404(item_id)
-    item.word = request.form.get("word", item.word)
-    item.translation = request.form.get("translation", item.translation)
-    db.session.commit()
 
-    flash("✏️ แก้ไขคำศัพท์เรียบร้อย", "success")
-    return redirect(url_for('admin.view_game_detail', game_id=game_id))
+    if request.method == "POST":
+        word = (request.form.get("correct_word") or request.form.get("word") or "").strip()
+        if not word:
+            flash("⚠️ กรุณากรอกคำศัพท์ (word) ก่อนบันทึก", "warning")
+            return redirect(request.url)
+
+        # ✅ เปลี่ยนรูป (ถ้าอัปโหลดใหม่)
+        image_file = request.files.get("image_file")
+        if image_file and image_file.filename:
+            item.image_name = save_upload(image_file)
+
+        old_word = item.correct_word
+        item.correct_word = word
+        item.pinyin = request.form.get("pinyin", item.pinyin)
+        if old_word != word:
+            tts.release(old_word, game.lang)
+            tts.schedule(word, game.lang)
+        db.session.commit()
+
+        flash("✏️ แก้ไขคำศัพท์เรียบร้อย", "success")
+        return redirect(url_for('admin.view_game_detail', game_id=game_id))
+
+    return render_template("edit_game_item.html", game=game, item=item)
 
 
 
@@ -525,10 +557,23 @@ def delete_game_item(game_id, item_id):
 
     item = GameItem.query.get_or_404(item_id)
     db.session.delete(item)
+    tts.release(item.correct_word, Game.query.get_or_404(game_id).lang)
+    refresh_game(game_id)
     db.session.commit()
 
     flash("🗑️ ลบคำศัพท์เรียบร้อย", "success")
-    return redirect(url_for("game_detail_drag.html", game_id=game_id))
+    return redirect(url_for("admin.view_game_detail", game_id=game_id))
+
+
+def _refresh_reference_embedding(old_answer, new_answer):
+    """อัปเดต cache เวกเตอร์คำตอบอ้างอิงของคำถามพูด (ผิดพลาดก็ไม่ขัดการบันทึก)"""
+    try:
+        if old_answer and old_answer != new_answer:
+            invalidate_reference(old_answer, model=Config.SPEECH_EMBED_MODEL)
+        if new_answer and new_answer != old_answer:
+            warm_reference(new_answer, model=Config.SPEECH_EMBED_MODEL)
+    except Exception as e:
+        print("❌ reference embedding error:", e)
 
 
 @admin_bp.route("/game/<int:game_id>/add_speech_question", methods=["GET", "POST"])
@@ -555,7 +600,9 @@ def add_speech_question(game_id):
             lang=lang
         )
         db.session.add(new_question)
+        refresh_game(game_id)
         db.session.commit()
+        _refresh_reference_embedding(None, correct_answer)
         flash("✅ เพิ่มคำถามพูดเรียบร้อย", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game.id))
 
@@ -572,11 +619,13 @@ def edit_speech_question(game_id, item_id):
     question = SpeechQuestion.query.get_or_404(item_id)
 
     if request.method == "POST":
+        old_answer = question.correct_answer
         question.question_text = request.form["question_text"]
         question.correct_answer = request.form["correct_answer"]  # ✅ ตรงกับ template
         question.pinyin = request.form.get("pinyin")
         question.lang = request.form.get("lang", "en")
         db.session.commit()
+        _refresh_reference_embedding(old_answer, question.correct_answer)
         flash("✏️ แก้ไขคำถามพูดเรียบร้อยแล้ว", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game_id))
 
@@ -595,8 +644,11 @@ def delete_speech_question(game_id, item_id):
         return redirect("/")
 
     question = SpeechQuestion.query.get_or_404(item_id)
+    old_answer = question.correct_answer
     db.session.delete(question)
+    refresh_game(game_id)
     db.session.commit()
+    _refresh_reference_embedding(old_answer, None)
     flash("🗑️ ลบคำถามพูดเรียบร้อยแล้ว", "success")
     return redirect(url_for("admin.view_game_detail", game_id=game_id))  # ✅ แก้ตรงนี้
 
@@ -625,6 +677,7 @@ def add_fill_item(game_id):
         )
 
         db.session.add(new_item)
+        refresh_game(game_id)
         db.session.commit()
         flash("✅ เพิ่มข้อเติมคำเรียบร้อยแล้ว", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game.id))
@@ -668,6 +721,7 @@ def delete_fill_item(game_id, item_id):
 
     item = FillInBlank.query.get_or_404(item_id)
     db.session.delete(item)
+    refresh_game(game_id)
     db.session.commit()
     flash("🗑️ ลบข้อเติมคำเรียบร้อยแล้ว", "success")
     return redirect(url_for("admin.view_game_detail", game_id=game_id))
@@ -700,6 +754,7 @@ def add_scramble_item(game_id):
             language=request.form.get("lang", "en")
         )
         db.session.add(new_item)
+        refresh_game(game_id)
         db.session.commit()
         flash("✅ เพิ่มประโยคเรียงคำเรียบร้อยแล้ว", "success")
     return redirect(url_for("admin.game_detail_speech", game_id=game_id))  # ✅ อยู่หน้าเดิม
@@ -733,6 +788,7 @@ def delete_scramble_item(game_id, item_id):
 
     item = ScrambleItem.query.get_or_404(item_id)
     db.session.delete(item)
+    refresh_game(game_id)
     db.session.commit()
     flash("🗑️ ลบประโยคเรียบร้อยแล้ว", "success")
     return redirect(url_for("admin.view_game_detail", game_id=game_id))
@@ -765,7 +821,11 @@ def add_choice_item(game_id):
             choice_d=choice_d,
             correct_choice=correct_choice
         )
+        prompt_image = request.files.get("prompt_image")
+        if prompt_image and prompt_image.filename:
+            new_item.prompt_image = save_upload(prompt_image)  # ✅ รูปโจทย์ + ไฟล์ย่อ
         db.session.add(new_item)
+        refresh_game(game_id)
         db.session.commit()
         flash("✅ เพิ่มคำถามแบบเลือกสำเร็จ", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game_id))
@@ -789,6 +849,9 @@ def edit_choice_item(game_id, item_id):
         item.choice_c = request.form["choice_c"]
         item.choice_d = request.form["choice_d"]
         item.correct_choice = request.form["correct_choice"]
+        prompt_image = request.files.get("prompt_image")
+        if prompt_image and prompt_image.filename:
+            item.prompt_image = save_upload(prompt_image)
         db.session.commit()
         flash("✏️ แก้ไขคำถามเรียบร้อยแล้ว", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game_id))
@@ -804,6 +867,7 @@ def delete_choice_item(game_id, item_id):
 
     item = ChoiceItem.query.get_or_404(item_id)
     db.session.delete(item)
+    refresh_game(game_id)
     db.session.commit()
     flash("🗑️ ลบคำถามเรียบร้อยแล้ว", "success")
     return redirect(url_for("admin.view_game_detail", game_id=game_id))
@@ -819,8 +883,8 @@ def add_question(lesson_id):
     if request.method == "POST":
         question = request.form["question"]
         correct_option = request.form["correct_option"]
-        lang = request.form["lang"]
-        question_type = request.form.get("question_type", "test")
+        lang = canonical_lang(request.form["lang"])
+        question_type = canonical_test_type(request.form.get("question_type"))
 
         new_q = Exercise(
             lesson_id=lesson_id,
@@ -830,6 +894,7 @@ def add_question(lesson_id):
             lang=lang
         )
         db.session.add(new_q)
+        refresh_lesson_quizzes(lesson_id)
         db.session.commit()
         flash("✅ เพิ่มคำถามแบบทดสอบสำเร็จ", "success")
         return redirect(url_for("admin.lesson_tests", lesson_id=lesson_id))
@@ -849,8 +914,9 @@ def edit_question(lesson_id, q_id):
     if request.method == "POST":
         question.question = request.form["question"]
         question.correct_option = request.form["correct_option"]
-        question.lang = request.form["lang"]
-        question.question_type = request.form.get("question_type", "test")
+        question.lang = canonical_lang(request.form["lang"])
+        question.question_type = canonical_test_type(request.form.get("question_type"))
+        refresh_lesson_quizzes(lesson_id)
         db.session.commit()
         flash("✏️ แก้ไขคำถามเรียบร้อย", "success")
         return redirect(url_for("admin.lesson_tests", lesson_id=lesson_id))
@@ -866,6 +932,7 @@ def delete_question(lesson_id, q_id):
 
     question = Exercise.query.get_or_404(q_id)
     db.session.delete(question)
+    refresh_lesson_quizzes(lesson_id)
     db.session.commit()
     flash("🗑️ ลบคำถามสำเร็จ", "success")
     return redirect(url_for("admin.lesson_tests", lesson_id=lesson_id))
@@ -896,9 +963,10 @@ def add_quiz_item(game_id):
             option_d=option_d,
             correct=correct.strip().upper(),  # ✅ เก็บเป็น A/B/C/D
             question_type="game",
-            lang=game.lang
+            lang=canonical_lang(game.lang)
         )
         db.session.add(new_item)
+        refresh_lesson_quizzes(game.lesson_id)  # นับใหม่ทุกเกมควิซในบทเดียวกัน (ใช้คำถามชุดเดียวกัน)
         db.session.commit()
         flash("✅ เพิ่มคำถามควิซสำเร็จ", "success")
         return redirect(url_for("admin.view_game_detail", game_id=game.id))
@@ -943,13 +1011,15 @@ def delete_quiz_item(game_id, item_id):
 
     # ลบออกจากฐานข้อมูล
     db.session.delete(item)
+    refresh_lesson_quizzes(game.lesson_id)
     db.session.commit()
 
     flash("🗑️ ลบคำถามควิซเรียบร้อยแล้ว", "success")
     return redirect(url_for("admin.view_game_detail", game_id=game.id))
-from flask import send_from_directory
+from utils.media_serving import send_media
 
 @admin_bp.route('/uploads/<path:filename>')
 def serve_upload(filename):
+    # ไฟล์เสียงแบบเดิม (ชื่ออาจถูกเขียนทับได้ → ไม่ใช้ immutable) รองรับ Range ให้เลื่อนเล่นได้ + 304 เมื่อเล่นซ้ำ
     upload_folder = os.path.join('static', 'uploads')
-    return send_from_directory(upload_folder, filename)
\ No newline at end of file
+    return send_media(upload_folder, filename, max_age=Config.UPLOAD_MAX_AGE)
\ No newline at end of file
@@ -1,13 +1,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import db, Lesson, Exercise, QuizResult
-import os, uuid
+from utils.canonical import canonical_lang, canonical_test_type
+from utils.images import save_upload
 
 admin_quiz_bp = Blueprint("admin_quiz", __name__, url_prefix="/admin/quiz")
 quiz_bp = Blueprint("quiz", __name__, url_prefix="/quiz")
 
-UPLOAD_FOLDER = "static/images"
-
 @admin_quiz_bp.route("/lesson/<int:lesson_id>")
 @login_required
 def lesson_questions(lesson_id):
@@ -18,7 +17,7 @@ def lesson_questions(lesson_id):
     lesson = Lesson.query.get_or_404(lesson_id)
     questions = Exercise.query.filter(
         Exercise.lesson_id == lesson_id,
-        Exercise.question_type.in_(["pre", "post", "pre_zh", "post_zh"])
+        Exercise.question_type.in_(["pre", "post"])
     ).all()
 
     return render_template("lesson_questions.html", lesson=lesson, questions=questions)
@@ -36,15 +35,11 @@ def add_question(lesson_id):
         image_file = request.files.get("image")
         image_path = None
         if image_file and image_file.filename:
-            ext = os.path.splitext(image_file.filename)[1]
-            filename = f"{uuid.uuid4().hex}{ext}"
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            image_file.save(os.path.join(UPLOAD_FOLDER, filename))
-            image_path = f"images/{filename}"
+            image_path = save_upload(image_file)  # ✅ media store (ชื่อตาม hash) + ไฟล์ย่อ WebP/AVIF
 
         new_q = Exercise(
         lesson_id=lesson.id,
-        question_type=request.form.get("question_type", "pre"),
+        question_type=canonical_test_type(request.form.get("question_type"), default="pre"),
         question=request.form.get("question", ""),
         option_a=request.form.get("option_a", ""),
         option_b=request.form.get("option_b", ""),
@@ -52,7 +47,7 @@ def add_question(lesson_id):
         option_d=request.form.get("option_d", ""),
         correct_option=request.form.get("correct_option", "A").strip().upper(),
         image_path=image_path,
-        lang=request.form.get("lang", lesson.lang or "en")  
+        lang=canonical_lang(request.form.get("lang"), default=canonical_lang(lesson.lang))
 )
 
         db.session.add(new_q)
@@ -73,7 +68,7 @@ def edit_question(question_id):
     lesson = Lesson.query.get_or_404(q.lesson_id)
 
     if request.method == "POST":
-        q.question_type = request.form.get("question_type", q.question_type)
+        q.question_type = canonical_test_type(request.form.get("question_type"), default=q.question_type)
         q.question = request.form["question"]
         q.option_a = request.form["option_a"]
         q.option_b = request.form["option_b"]
@@ -83,11 +78,7 @@ def edit_question(question_id):
 
         image_file = request.files.get("image")
         if image_file and image_file.filename:
-            ext = os.path.splitext(image_file.filename)[1]
-            filename = f"{uuid.uuid4().hex}{ext}"
-            os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-            image_file.save(os.path.join(UPLOAD_FOLDER, filename))
-            q.image_path = f"images/{filename}"
+            q.image_path = save_upload(image_file)
 
         db.session.commit()
         flash("✅ บันทึกการแก้ไขเรียบร้อยแล้ว")
@@ -114,12 +105,14 @@ def delete_question(question_id):
 # ✅ ฟังก์ชัน core สำหรับทำแบบทดสอบ (รวมทุก test_type)
 def _take_quiz_core(lesson_id, lang, test_type):
     lesson = Lesson.query.get_or_404(lesson_id)
-    lang = (lang or "").lower()
+    lang = canonical_lang(lang)
+    test_type = canonical_test_type(test_type)
 
-    questions = Exercise.query.filter(
-        Exercise.lesson_id == lesson_id,
-        Exercise.question_type.in_([test_type, f"{test_type}_zh"]),
-        Exercise.lang.ilike(f"%{lang[:2]}%")
+    # ✅ ค่าในตารางเป็นค่ามาตรฐานแล้ว → เทียบด้วย = ใช้ index (lesson_id, question_type, lang) ได้
+    questions = Exercise.query.filter_by(
+        lesson_id=lesson_id,
+        question_type=test_type,
+        lang=lang
     ).all()
 
     # ไม่มีคำถาม
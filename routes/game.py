@@ -1,33 +1,68 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app, abort
 from flask_login import login_required, current_user
 from models import (
     db, Game, GameItem, ChoiceItem, FillInBlank, MatchingItem,
     ScrambleItem, SpeechQuestion, GameScore, Exercise, QuizResult, SpeechResult
 )
-import random, tempfile, os, time
-import whisper
-from sentence_transformers import SentenceTransformer, util
+from flask_sock import Sock
+import random, json, time
+from config import Config
+from utils.leaderboard import refresh_user as refresh_leaderboard
+from utils.item_index import get_count
+from utils import content_cache
+from utils.play_payload import get_payload
+from utils.audio import decode_audio_bytes, AudioDecodeError, SAMPLE_RATE
+from utils.nlp_utils import transcribe_audio, reference_similarity, cache_stats
+from utils.speech_jobs import get_speech_queue, QueueFull
+from utils.vad import vad_stats
 
 game_bp = Blueprint("game", __name__, url_prefix="/game")
-whisper_model = whisper.load_model("base")
-embedder = SentenceTransformer("paraphrase-MiniLM-L6-v2")
+sock = Sock()
 
 def get_theme_for_game(game):
     return {"bg_color": "#f9f9f9", "accent": "#1976d2"}
 
-def save_game_score(user_id, game_id, score):
-    record = GameScore.query.filter_by(user_id=user_id, game_id=game_id).first()
-    if record:
-        record.score = max(record.score, score)
+def _upsert_score(user_id, game_id, score):
+    """
+    INSERT ... ON CONFLICT (user_id, game_id) DO UPDATE เก็บคะแนนที่สูงกว่า — statement เดียว ไม่แข่งกันเมื่อส่งซ้ำ
+    ต้องมี unique index uq_game_score_user_game (python manage.py migrate)
+    """
+    table = GameScore.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        greatest = db.func.greatest
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        greatest = db.func.max  # max(a, b) ของ SQLite แบบ scalar
     else:
-        db.session.add(GameScore(user_id=user_id, game_id=game_id, score=score))
+        # ฐานข้อมูลอื่น: ล็อกแถวแล้วอัปเดตแบบเดิม
+        record = GameScore.query.filter_by(user_id=user_id, game_id=game_id).with_for_update().first()
+        if record:
+            record.score = max(record.score, score)
+        else:
+            db.session.add(GameScore(user_id=user_id, game_id=game_id, score=score))
+        return
+
+    stmt = insert(table).values(user_id=user_id, game_id=game_id, score=score)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.game_id],
+        set_={"score": greatest(table.c.score, stmt.excluded.score)},
+    )
+    db.session.execute(stmt)
+
+
+def save_game_score(user_id, game_id, score):
+    _upsert_score(user_id, game_id, score)
+    refresh_leaderboard(user_id)  # อัปเดตตารางอันดับใน transaction เดียวกัน
     db.session.commit()
 
 
 @game_bp.route("/play/<int:game_id>", methods=["GET", "POST"])
 @login_required
 def play_game(game_id):
-    game = Game.query.get_or_404(game_id)
+    # เนื้อหาเกมและข้อมาจาก cache (โหลดใหม่เมื่อแอดมินแก้ไข) — query เฉพาะคะแนนของผู้ใช้
+    game = content_cache.get_game(game_id) or abort(404)
     gtype = (game.game_type or "").lower().strip()
     lang = game.lang or "en"
     theme = get_theme_for_game(game)
@@ -42,7 +77,8 @@ def play_game(game_id):
 
     
     if gtype in ["matching", "จับคู่"]:
-        items = MatchingItem.query.filter_by(game_id=game.id).all()
+        payload = get_payload(game, "matching")
+        items = payload["items"]
         if played:
             return redirect(score_url)
 
@@ -65,20 +101,19 @@ def play_game(game_id):
                 lang=lang
             )
 
-        answers = items[:]
-        random.shuffle(answers)
+        answers = random.sample(items, len(items))
         return render_template("play_matching.html", game=game, items=items, answers=answers,
-                               theme=theme, played=played, lang=lang , lesson=game.lesson)
+                               tts=payload["tts"], theme=theme, played=played, lang=lang , lesson=game.lesson)
 
     
     elif gtype in ["drag", "drag drop"]:
-        items = GameItem.query.filter_by(game_id=game.id).all()
+        payload = get_payload(game, "drag")
+        items = payload["items"]
         if played:
             return redirect(score_url)
 
-        words = [i.correct_word for i in items]
-        random.shuffle(words)
-        pinyin_map = {i.correct_word: i.pinyin or "" for i in items}
+        words = random.sample(payload["words"], len(payload["words"]))
+        pinyin_map = payload["pinyin_map"]
 
         return render_template(
             "play_drag.html",
@@ -86,6 +121,7 @@ def play_game(game_id):
             items=items,
             shuffled_words=words,
             pinyin_map=pinyin_map,
+            tts=payload["tts"],
             theme=theme,
             played=played,
             lang=lang,
@@ -95,24 +131,19 @@ def play_game(game_id):
 
 
     elif gtype in ["fill", "fill-in-the-blank", "เติมคำ"]:
-        items = FillInBlank.query.filter_by(game_id=game.id).all()
+        payload = get_payload(game, "fill")
+        items = payload["items"]
         if played:
             return redirect(score_url)
 
-        
-        hint_words = []
-        for it in items:
-            if it.correct_word:
-                hint_words += [w.strip() for w in it.correct_word.split(";")]
-        hint_words = list(set(hint_words))  
-        random.shuffle(hint_words)
+        hint_words = random.sample(payload["hint_words"], len(payload["hint_words"]))
 
         
         if request.method == "POST":
             score, results = 0, []
             for it in items:
                 ans = request.form.get(f"q{it.id}", "").strip().lower()
-                corrects = [c.strip().lower() for c in it.correct_word.split(";")]
+                corrects = payload["answers"][it.id]
                 ok = ans in corrects
                 if ok:
                     score += 1
@@ -148,14 +179,15 @@ def play_game(game_id):
         )
 
     elif gtype in ["scramble", "sentence scramble", "เรียงคำ"]:
-        items = ScrambleItem.query.filter_by(game_id=game.id).all()
+        payload = get_payload(game, "scramble")
+        items = payload["items"]
         if played:
             return redirect(score_url)
 
         if request.method == "POST":
             score, results = 0, []
             for it in items:
-                correct = it.words
+                correct = payload["words"][it.id]
                 ans = (request.form.get(f"q{it.id}") or "").split("|")
                 ok = ans == correct
                 if ok:
@@ -179,21 +211,24 @@ def play_game(game_id):
                 lang=lang
             )
 
-        scrambled = [{"id": it.id, "words": random.sample(it.words, len(it.words))} for it in items]
+        scrambled = [
+            {"id": it.id, "words": random.sample(payload["words"][it.id], len(payload["words"][it.id]))}
+            for it in items
+        ]
         return render_template("play_scramble.html", game=game, scrambled=scrambled,
                                theme=theme, played=played, lang=lang)
 
     
     elif gtype in ["choice", "choice_match", "ช้อยส์"]:
-        items = ChoiceItem.query.filter_by(game_id=game.id).all()
+        payload = get_payload(game, "choice")
+        items = payload["items"]
         if played:
             return redirect(score_url)
 
-        display = []
-        for it in items:
-            opts = it.options.split(";") if it.options else []
-            random.shuffle(opts)
-            display.append({"item": it, "options": opts})
+        display = [
+            {"item": it, "options": random.sample(payload["options"][it.id], len(payload["options"][it.id]))}
+            for it in items
+        ]
 
         if request.method == "POST":
             score, results = 0, []
@@ -226,19 +261,15 @@ def play_game(game_id):
 
    
     elif gtype in ["quiz", "exam", "test", "แบบทดสอบ"]:
-        # ✅ ตรวจว่าผู้ใช้เคยเล่นแล้วหรือยัง
-        record = GameScore.query.filter_by(user_id=current_user.id, game_id=game.id).first()
+        # ✅ ตรวจว่าผู้ใช้เคยเล่นแล้วหรือยัง (ใช้ record ที่ดึงไว้ด้านบน)
         if record and not current_user.allow_retake_game:
             flash("คุณเคยทำแบบทดสอบนี้แล้ว ✅", "info")
             # 👉 ไปหน้าผลคะแนน quiz
             return redirect(url_for("student.lesson_score_detail", lesson_id=game.lesson_id))
 
         
-        items = Exercise.query.filter_by(
-            lesson_id=game.lesson_id,
-            question_type="game",  
-            lang=game.lang
-        ).all()
+        payload = get_payload(game, "quiz")
+        items = payload["items"]
 
         #  เมื่อผู้ใช้ส่งคำตอบ
         if request.method == "POST":
@@ -249,7 +280,7 @@ def play_game(game_id):
 
             for it in items:
                 user_ans = request.form.get(f"q{it.id}", "").strip().upper()
-                correct = (it.correct_option or "").strip().upper()
+                correct = payload["answers"][it.id]
                 user_answers[it.id] = user_ans
                 correct_answers[it.id] = correct
                 ok = user_ans == correct
@@ -287,18 +318,11 @@ def play_game(game_id):
     elif gtype in ["speech", "speaking", "speaking game", "พูด", "พูดคุย"]:
 
 
-        questions = SpeechQuestion.query.filter_by(game_id=game.id).all()
+        payload = get_payload(game, "speech")
         if played:
             return redirect(score_url)
-        random.shuffle(questions)
-
-        if lang == "zh":
-            pinyin_map = {
-                q.correct_answer: getattr(q, "pinyin", "") or getattr(q, "pinyin_text", "") or ""
-                for q in questions
-            }
-        else:
-            pinyin_map = {}
+        questions = random.sample(payload["questions"], len(payload["questions"]))
+        pinyin_map = payload["pinyin_map"]
 
         return render_template(
             "play_speech.html",
@@ -310,49 +334,26 @@ def play_game(game_id):
             lang=lang
         )
 
-@game_bp.route("/speech_upload", methods=["POST"])
-@login_required
-def speech_upload():
-    from werkzeug.utils import secure_filename
-    audio = request.files.get("audio")
-    qid = request.form.get("question_id")
-    lang = request.form.get("lang", "en")
-
-    if not audio or not qid:
-        return jsonify({"success": False, "message": "ข้อมูลไม่ครบ"})
-
-    tmp_dir = os.path.join(tempfile.gettempdir(), "speech_uploads")
-    os.makedirs(tmp_dir, exist_ok=True)
-    tmp_path = os.path.join(tmp_dir, secure_filename(f"speech_{int(time.time()*1000)}.webm"))
-
+def _score_speech(user_id, qid, lang, audio_bytes):
+    """ถอดเสียงด้วย Whisper แล้วเทียบความคล้ายกับคำตอบ พร้อมบันทึก SpeechResult"""
     try:
-        audio.save(tmp_path)
-        for _ in range(50):
-            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) > 1000:
-                break
-            time.sleep(0.1)
-
         lang_code = "zh" if "zh" in lang.lower() else "en"
-        result = whisper_model.transcribe(tmp_path, fp16=False, language=lang_code)
-        transcript = result.get("text", "").strip()
+        transcript = transcribe_audio(audio_bytes, lang=lang_code)
     except Exception as e:
-        return jsonify({"success": False, "message": f"Whisper error: {e}"})
-    finally:
-        if os.path.exists(tmp_path):
-            try: os.remove(tmp_path)
-            except Exception: pass
+        return {"success": False, "message": f"Whisper error: {e}"}
+    return _grade_transcript(user_id, qid, transcript)
+
 
+def _grade_transcript(user_id, qid, transcript):
     question = SpeechQuestion.query.get(int(qid))
     if not question:
-        return jsonify({"success": False, "message": "ไม่พบคำถาม"})
+        return {"success": False, "message": "ไม่พบคำถาม"}
 
     correct = question.correct_answer or ""
-    emb1 = embedder.encode(transcript, convert_to_tensor=True)
-    emb2 = embedder.encode(correct, convert_to_tensor=True)
-    similarity = float(util.cos_sim(emb1, emb2))
+    similarity = reference_similarity(transcript, correct, model=Config.SPEECH_EMBED_MODEL)
 
     db.session.add(SpeechResult(
-        user_id=current_user.id,
+        user_id=user_id,
         question_id=qid,
         spoken_text=transcript,
         similarity_score=similarity,
@@ -361,7 +362,125 @@ def speech_upload():
     ))
     db.session.commit()
 
-    return jsonify({"success": True, "transcript": transcript, "similarity": round(similarity, 3)})
+    return {"success": True, "transcript": transcript, "similarity": round(similarity, 3)}
+
+
+@game_bp.route("/speech_upload", methods=["POST"])
+@login_required
+def speech_upload():
+    """
+    รับไฟล์เสียงคำตอบ
+    - ปกติ: ตรวจทันทีแล้วคืน transcript/similarity
+    - mode=async: เข้าคิวแล้วคืน job_id ทันที (202) ให้ client poll ที่ /game/speech_job/<job_id>
+    """
+    audio = request.files.get("audio")
+    qid = request.form.get("question_id")
+    lang = request.form.get("lang", "en")
+    run_async = (request.form.get("mode") or request.args.get("mode")) == "async"
+
+    # อ่านไฟล์เสียงจาก request ตรง ๆ แล้วถอดรหัสในหน่วยความจำ (ไม่ผ่านไฟล์ชั่วคราว)
+    audio_bytes = audio.read() if audio else b""
+    if not audio_bytes or not qid:
+        return jsonify({"success": False, "message": "ข้อมูลไม่ครบ"})
+
+    if not run_async:
+        return jsonify(_score_speech(current_user.id, qid, lang, audio_bytes))
+
+    jobs = get_speech_queue(current_app._get_current_object())
+    try:
+        job_id = jobs.submit(_score_speech, current_user.id, qid, lang, audio_bytes, owner=current_user.id)
+    except QueueFull:
+        return jsonify({"success": False, "message": "ระบบกำลังตรวจเสียงจำนวนมาก กรุณาลองใหม่"}), 503
+
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "poll_url": url_for("game.speech_job", job_id=job_id)
+    }), 202
+
+
+@game_bp.route("/speech_job/<job_id>")
+@login_required
+def speech_job(job_id):
+    """สถานะงานตรวจเสียงแบบ async (queued / running / done / failed)"""
+    job = get_speech_queue(current_app._get_current_object()).get(job_id)
+    if not job or job["owner"] != current_user.id:
+        return jsonify({"success": False, "message": "ไม่พบงานนี้"}), 404
+
+    if job["status"] == "done":
+        return jsonify({"status": "done", **job["result"]})
+    if job["status"] == "failed":
+        return jsonify({"status": "failed", "success": False, "message": job["error"]})
+    return jsonify({"status": job["status"], "success": True})
+
+
+@game_bp.route("/speech_jobs/stats")
+@login_required
+def speech_jobs_stats():
+    """ตัวเลขของคิว (queue depth, wait, latency) และเวลาที่ VAD ตัดทิ้ง สำหรับปรับขนาด worker pool"""
+    if (current_user.role or "").lower() not in ["admin", "teacher"]:
+        return jsonify({"success": False, "message": "ไม่มีสิทธิ์"}), 403
+    return jsonify({
+        **get_speech_queue(current_app._get_current_object()).stats(),
+        "vad": vad_stats(),
+        "cache": cache_stats(),
+    })
+
+
+@sock.route("/speech_stream", bp=game_bp)
+def speech_stream(ws):
+    """
+    WebSocket สำหรับเกมพูดแบบสตรีม (ต้องรันด้วย worker แบบ thread/gevent)
+    - client ส่ง chunk เสียงจาก MediaRecorder เป็น binary message ระหว่างที่ยังพูดอยู่
+    - server ถอดเสียงช่วงล่าสุด (window) แล้วส่ง {"type": "partial", transcript, similarity} กลับ
+    - client ส่งข้อความ "end" เมื่อหยุดพูด → ตรวจทั้งคลิป บันทึกผล แล้วส่ง {"type": "final", ...}
+    """
+    if not current_user.is_authenticated:
+        ws.close()
+        return
+
+    qid = request.args.get("question_id", type=int)
+    lang_code = "zh" if "zh" in (request.args.get("lang") or "en").lower() else "en"
+    question = SpeechQuestion.query.get(qid) if qid else None
+    if not question:
+        ws.send(json.dumps({"type": "error", "message": "ไม่พบคำถาม"}))
+        ws.close()
+        return
+    correct = question.correct_answer or ""
+    db.session.remove()  # ไม่ถือ connection ของฐานข้อมูลไว้ตลอดการพูด
+
+    interval = Config.SPEECH_STREAM_INTERVAL_MS / 1000.0
+    window = int(Config.SPEECH_STREAM_WINDOW_S * SAMPLE_RATE)
+    buf = bytearray()
+    last_partial, finished = 0.0, False
+
+    while not finished:
+        msg = ws.receive()
+        # ดึง chunk ที่ค้างอยู่ทั้งหมดก่อน เพื่อถอดเสียงจากข้อมูลล่าสุดเสมอ
+        while msg is not None:
+            if isinstance(msg, str):
+                finished = msg == "end"
+                if finished:
+                    break
+            else:
+                buf.extend(msg)
+            msg = ws.receive(timeout=0)
+
+        if finished or not buf or time.monotonic() - last_partial < interval:
+            continue
+        try:
+            audio = decode_audio_bytes(bytes(buf))[-window:]
+            transcript = transcribe_audio(audio, lang=lang_code)
+        except AudioDecodeError:
+            continue  # ยังได้ข้อมูลไม่พอให้ถอดรหัส
+        last_partial = time.monotonic()
+        similarity = reference_similarity(transcript, correct, model=Config.SPEECH_EMBED_MODEL) if transcript else 0.0
+        ws.send(json.dumps({"type": "partial", "transcript": transcript, "similarity": round(similarity, 3)}, ensure_ascii=False))
+
+    result = _score_speech(current_user.id, qid, lang_code, bytes(buf)) if buf else {"success": False, "message": "ไม่มีเสียง"}
+    ws.send(json.dumps({"type": "final", **result}, ensure_ascii=False))
+    ws.close()
 
 
 @game_bp.route("/speech_finish/<int:game_id>", methods=["POST"])
@@ -398,7 +517,7 @@ def speech_result(game_id):
     game = Game.query.get_or_404(game_id)
     record = GameScore.query.filter_by(user_id=current_user.id, game_id=game.id).first()
     score = record.score if record else 0
-    total = SpeechQuestion.query.filter_by(game_id=game.id).count()
+    total = get_count(game)
     percentage = round((score / total) * 100, 2) if total > 0 else 0
     return render_template("speech_result.html", game=game, score=score, total=total, percentage=percentage)
 
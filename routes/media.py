@@ -0,0 +1,81 @@
+import os
+from flask import Blueprint, url_for
+from markupsafe import Markup, escape
+from config import Config
+from utils.images import read_manifest, static_path
+from utils.media_serving import send_media, send_precompressed
+from utils.media_store import MEDIA_PREFIX, STATIC_ROOT, is_stored, legacy_path
+
+media_bp = Blueprint("media", __name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+@media_bp.route("/media/<path:path>")
+def media_file(path):
+    """ ไฟล์ใน media store ชื่อตาม hash ของเนื้อหา → ไม่มีวันเปลี่ยน cache ได้ 1 ปี """
+    # ETag จากพาธ (มี sha256 อยู่แล้ว) → เหมือนกันทุกเครื่อง / ทุก deploy ไม่ขึ้นกับ mtime
+    return send_media(
+        os.path.join(STATIC_ROOT, MEDIA_PREFIX), path,
+        max_age=IMMUTABLE_MAX_AGE, immutable=True, etag=path.replace("/", "-"),
+    )
+
+
+@media_bp.route("/static/css/<path:filename>")
+def static_css(filename):
+    """ CSS แบบบีบอัดไว้ล่วงหน้า (python manage.py compress-static) — ทับ route static ของ Flask เฉพาะ css """
+    return send_precompressed(os.path.join(STATIC_ROOT, "css"), filename, max_age=Config.STATIC_MAX_AGE)
+
+
+@media_bp.app_template_global()
+def media_url(value, kind="image"):
+    """
+    URL ของค่าที่เก็บในคอลัมน์สื่อ: 'media/..' (store), 'uploads/..', 'images/..' หรือชื่อไฟล์เปล่าแบบเดิม
+    kind='audio' สำหรับชื่อไฟล์เปล่าที่อยู่ใน static/audio
+    """
+    if not value:
+        return ""
+    if is_stored(value):
+        return url_for("media.media_file", path=value[len(MEDIA_PREFIX):])
+    path = legacy_path(value, kind)
+    if path.startswith("uploads/"):
+        return url_for("admin.serve_upload", filename=path[len("uploads/"):])
+    return url_for("static", filename=path)
+
+
+def _attrs(**attrs):
+    return "".join(
+        f' {escape(k.rstrip("_").replace("_", "-"))}="{escape(v)}"' for k, v in attrs.items() if v is not None
+    )
+
+
+@media_bp.app_template_global()
+def responsive_image(path, alt="", sizes="100vw", **attrs):
+    """
+    <picture> พร้อม srcset ของไฟล์ย่อ (AVIF / WebP) และ placeholder ระหว่างโหลด
+    ถ้ารูปยังไม่ได้แปลง (python manage.py build-image-variants) จะได้ <img> ต้นฉบับเหมือนเดิม
+    ใช้ใน template: {{ responsive_image(q.image_path, alt="...", sizes="150px", class_="thumb") }}
+    """
+    if not path:
+        return ""
+    rel_path = static_path(path)
+    src = media_url(rel_path)
+    manifest = read_manifest(rel_path)
+    if not manifest:
+        return Markup(f'<img src="{escape(src)}"{_attrs(alt=alt, loading="lazy", decoding="async", **attrs)}>')
+
+    sources = []
+    for fmt in ("avif", "webp"):
+        entries = manifest["sources"].get(fmt)
+        if entries:
+            srcset = ", ".join(f"{media_url(p)} {w}w" for p, w in entries)
+            sources.append(f"<source{_attrs(type=f'image/{fmt}', srcset=srcset, sizes=sizes)}>")
+
+    style = f"height:auto;background:url({manifest['placeholder']}) center/cover no-repeat;"
+    if attrs.get("style"):
+        style = attrs.pop("style") + ";" + style
+    img = f'<img src="{escape(src)}"' + _attrs(
+        alt=alt, width=manifest["width"], height=manifest["height"],
+        loading="lazy", decoding="async", style=style, **attrs
+    ) + ">"
+    return Markup("<picture>" + "".join(sources) + img + "</picture>")
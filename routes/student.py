@@ -1,105 +1,88 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort
 
 from models import (
     db, Lesson, Game, GameScore, QuizResult,
     Exercise, FillInBlank, MatchingItem, ScrambleItem, SpeechQuestion,ChoiceItem
 )
+from utils.score_loader import (
+    best_score_by_lesson, latest_score_by_game, quiz_scores_by_lesson, unit_overview
+)
+from utils.item_index import get_counts
+from utils import content_cache
 
 student_bp = Blueprint("student", __name__, url_prefix="/student")
 
 @student_bp.route("/dashboard_en")
 @login_required
 def dashboard_en():
-    lessons = Lesson.query.filter_by(lang="en").all()
+    lessons = content_cache.lessons_by_lang("en")
     return render_template("student_dashboard.html", lessons=lessons, lang="en")
 
 # 🏠 Dashboard (ZH)
 @student_bp.route("/dashboard_zh")
 @login_required
 def dashboard_zh():
-    lessons = Lesson.query.filter_by(lang="zh").all()
+    lessons = content_cache.lessons_by_lang("zh")
     return render_template("student_dashboard_zh.html", lessons=lessons, lang="zh")
 
+def _exercise_scores(lang):
+    lessons = content_cache.lessons_by_lang(lang)
+    best = best_score_by_lesson(current_user.id, [l.id for l in lessons])
+    return [{"lesson": lesson, "score": best.get(lesson.id, 0)} for lesson in lessons]
+
+
+def _test_scores(lang):
+    lessons = content_cache.lessons_by_lang(lang)
+    quiz = quiz_scores_by_lesson(current_user.id, [l.id for l in lessons])
+    return [
+        {
+            "lesson": lesson,
+            "pre_score": quiz.get(lesson.id, {}).get("pre"),
+            "post_score": quiz.get(lesson.id, {}).get("post"),
+        }
+        for lesson in lessons
+    ]
+
 # 🧩 Exercise Score (EN)
 @student_bp.route("/exercise_score_en")
 @login_required
 def exercise_score_en():
-    lessons = Lesson.query.filter_by(lang="en").all()
-    lesson_scores = []
-    for lesson in lessons:
-        score = (
-            db.session.query(db.func.max(GameScore.score))
-            .join(Game, Game.id == GameScore.game_id)
-            .filter(Game.lesson_id == lesson.id, GameScore.user_id == current_user.id)
-            .scalar()
-        ) or 0
-        lesson_scores.append({"lesson": lesson, "score": score})
-    return render_template("student_score.html", lessons=lesson_scores, lang="en")
+    return render_template("student_score.html", lessons=_exercise_scores("en"), lang="en")
 
 # 🧩 Exercise Score (ZH)
 @student_bp.route("/exercise_score_zh")
 @login_required
 def exercise_score_zh():
-    lessons = Lesson.query.filter_by(lang="zh").all()
-    lesson_scores = []
-    for lesson in lessons:
-        score = (
-            db.session.query(db.func.max(GameScore.score))
-            .join(Game, Game.id == GameScore.game_id)
-            .filter(Game.lesson_id == lesson.id, GameScore.user_id == current_user.id)
-            .scalar()
-        ) or 0
-        lesson_scores.append({"lesson": lesson, "score": score})
-    return render_template("exercise_score_zh.html", lessons=lesson_scores, lang="zh")
+    return render_template("exercise_score_zh.html", lessons=_exercise_scores("zh"), lang="zh")
 
 # 🧪 Test Scores (EN)
 @student_bp.route("/test_scores_en")
 @login_required
 def test_scores_en():
-    lessons = Lesson.query.filter_by(lang="en").all()
-    data = []
-    for lesson in lessons:
-        pre = QuizResult.query.filter_by(user_id=current_user.id, lesson_id=lesson.id, test_type="pre").first()
-        post = QuizResult.query.filter_by(user_id=current_user.id, lesson_id=lesson.id, test_type="post").first()
-        data.append({
-            "lesson": lesson,
-            "pre_score": pre.score if pre else None,
-            "post_score": post.score if post else None
-        })
-    return render_template("test_scores.html", lesson_scores=data, lang="en")
+    return render_template("test_scores.html", lesson_scores=_test_scores("en"), lang="en")
 
 # 🧪 Test Scores (ZH)
 @student_bp.route("/test_scores_zh")
 @login_required
 def test_scores_zh():
-    lessons = Lesson.query.filter_by(lang="zh").all()
-    data = []
-    for lesson in lessons:
-        pre = QuizResult.query.filter_by(user_id=current_user.id, lesson_id=lesson.id, test_type="pre").first()
-        post = QuizResult.query.filter_by(user_id=current_user.id, lesson_id=lesson.id, test_type="post").first()
-        data.append({
-            "lesson": lesson,
-            "pre_score": pre.score if pre else None,
-            "post_score": post.score if post else None
-        })
-    return render_template("test_scores_zh.html", lesson_scores=data, lang="zh")
+    return render_template("test_scores_zh.html", lesson_scores=_test_scores("zh"), lang="zh")
 
 # 🎯 Unit Detail
 @student_bp.route("/unit/<int:unit_id>")
 @login_required
 def unit_detail(unit_id):
-    unit = Lesson.query.get_or_404(unit_id)
-    games = Game.query.filter_by(lesson_id=unit_id).all()
-
-    # เช็กเกมที่เคยเล่น
-    for g in games:
-        g.played = GameScore.query.filter_by(user_id=current_user.id, game_id=g.id).first() is not None
+    # ✅ บทเรียน + เกม + สถานะเล่นแล้ว + pre/post ใน query เดียว
+    overview = unit_overview(current_user.id, unit_id)
+    if overview is None:
+        abort(404)
+    unit, rows, pre_done, post_done = overview
 
-    # เช็ก pre/post
-    pre_done = QuizResult.query.filter_by(user_id=current_user.id, lesson_id=unit_id, test_type="pre").first() is not None
-    post_done = QuizResult.query.filter_by(user_id=current_user.id, lesson_id=unit_id, test_type="post").first() is not None
+    games = []
+    for g, played in rows:
+        g.played = played
+        games.append(g)
 
     template = "unit_detail.html" if unit.lang == "en" else "unit_detail_zh.html"
     return render_template(template, unit=unit, games=games, pre_done=pre_done, post_done=post_done, lang=unit.lang)
@@ -112,34 +95,13 @@ def lesson_score_detail(lesson_id):
         return redirect(url_for('login'))
 
     user_id = session['user_id']
-    lesson = Lesson.query.get_or_404(lesson_id)
-    games = Game.query.filter_by(lesson_id=lesson.id).order_by(Game.id).all()
-
-    scores = []
-    for g in games:
-        latest = (
-            GameScore.query
-            .filter_by(user_id=user_id, game_id=g.id)
-            .order_by(GameScore.played_at.desc())
-            .first()
-        )
-        score_val = latest.score if latest else 0
-
-        # ✅ ดึงจำนวนข้อของเกมนั้น
-        if g.game_type in ["quiz", "exam", "test"]:
-            max_q = Exercise.query.filter_by(lesson_id=g.lesson_id, question_type="game", lang=g.lang).count()
-        elif g.game_type in ["choice", "choice_match"]:
-            max_q = ChoiceItem.query.filter_by(game_id=g.id).count()
-        elif g.game_type in ["scramble"]:
-            max_q = ScrambleItem.query.filter_by(game_id=g.id).count()
-        elif g.game_type in ["fill", "fill-in-the-blank"]:
-            max_q = FillInBlank.query.filter_by(game_id=g.id).count()
-        elif g.game_type in ["matching"]:
-            max_q = MatchingItem.query.filter_by(game_id=g.id).count()
-        else:
-            max_q = 10  # fallback
-
-        scores.append({"score": score_val, "max": max_q})
+    lesson = content_cache.get_lesson(lesson_id) or abort(404)
+    games = content_cache.games_by_lesson(lesson.id)
+
+    # ✅ คะแนนล่าสุด (query แบบรวม) + จำนวนข้อจากดัชนี game_item_count (ไม่ต้องนับใหม่ทุกครั้ง)
+    latest = latest_score_by_game(user_id, [g.id for g in games])
+    max_items = get_counts(games)
+    scores = [{"score": latest.get(g.id, 0), "max": max_items[g.id]} for g in games]
 
     return render_template(
         "lesson_score_detail.html",
@@ -158,22 +120,12 @@ def lesson_score_detail_zh(lesson_id):
 
     user_id = session['user_id']
 
-    # ดึงบทเรียน (จีน)
-    lesson = Lesson.query.get_or_404(lesson_id)
-
-    # ดึงเกมในบทนี้ทั้งหมด
-    games = Game.query.filter_by(lesson_id=lesson.id).order_by(Game.id).all()
-
-    scores = []
-    for g in games:
-        latest = (
-            GameScore.query
-            .filter_by(user_id=user_id, game_id=g.id)
-            .order_by(GameScore.played_at.desc())
-            .first()
-        )
-        score_val = latest.score if latest else 0
-        scores.append(score_val)
+    # ดึงบทเรียน (จีน) + เกมในบทนี้ทั้งหมด (จาก cache เนื้อหา)
+    lesson = content_cache.get_lesson(lesson_id) or abort(404)
+    games = content_cache.games_by_lesson(lesson.id)
+
+    latest = latest_score_by_game(user_id, [g.id for g in games])
+    scores = [latest.get(g.id, 0) for g in games]
 
     # 🔎 Debug print
     print("DEBUG >> Lesson ZH:", lesson.title)
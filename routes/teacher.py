@@ -1,8 +1,10 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models import db, User, Game, GameScore, Lesson, QuizResult
+from utils.leaderboard import get_ranking, get_breakdown, refresh_user
 
 teacher_bp = Blueprint("teacher", __name__, url_prefix="/teacher")
+RANKING_PER_PAGE = 50
 
 # ------------------------- RANKING -------------------------
 @teacher_bp.route("/ranking")
@@ -13,25 +15,21 @@ def teacher_ranking():
         return redirect(url_for("student.dashboard_en"))
 
     classroom = request.args.get("classroom")
+    lang = request.args.get("lang") or None
+    lesson_id = request.args.get("lesson_id", type=int)
+    page = request.args.get("page", 1, type=int)
+
+    # อ่านคะแนนรวมจากตาราง leaderboard_total (ไม่วนทีละนักเรียน × ทีละเกม)
+    result = get_ranking(
+        current_user.school, classroom=classroom, lang=lang,
+        lesson_id=lesson_id, page=page, per_page=RANKING_PER_PAGE
+    )
+    ranking = result["rows"]
 
-    # Fetching all students in the same school
-    students_query = User.query.filter_by(role="student", school=current_user.school)
-    if classroom:
-        students_query = students_query.filter_by(classroom=classroom)
-    students = students_query.all()
-    games = Game.query.all()
-
-    # Calculating total score for each student
-    ranking_data = []
-    for student in students:
-        total_score = 0
-        for game in games:
-            score_obj = GameScore.query.filter_by(user_id=student.id, game_id=game.id).first()
-            total_score += score_obj.score if score_obj else 0
-        ranking_data.append({"student": student, "total": total_score})
-
-    # Sorting students by total score in descending order
-    ranking = sorted(ranking_data, key=lambda x: x["total"], reverse=True)
+    # คะแนนแยกภาษา (EN / ZH) ของนักเรียนในหน้านี้
+    breakdown = get_breakdown([r["student"].id for r in ranking], by="lang")
+    for row in ranking:
+        row["by_lang"] = breakdown.get(row["student"].id, {})
 
     # Getting the classrooms for dropdown filter with count of students
     classrooms = (
@@ -41,11 +39,19 @@ def teacher_ranking():
         .all()
     )
 
+    lessons = Lesson.query.filter_by(lang=lang).all() if lang else Lesson.query.all()
+
     return render_template(
         "ranking.html",
         ranking=ranking,
         classrooms=classrooms,
         selected_classroom=classroom,
+        lessons=lessons,
+        selected_lang=lang,
+        selected_lesson=lesson_id,
+        page=result["page"],
+        pages=result["pages"],
+        student_count=result["count"],
     )
 
 
@@ -101,6 +107,7 @@ def allow_retake_game(student_id, game_id):
 
     # ลบคะแนนเก่า (เพื่อให้เล่นใหม่)
     GameScore.query.filter_by(user_id=student_id, game_id=game_id).delete()
+    refresh_user(student_id)
     db.session.commit()
 
     flash(f"✅ อนุมัติให้นักเรียน {student.name} เล่นเกม '{game.title}' ใหม่ได้แล้ว")
@@ -139,6 +146,7 @@ def reset_game_score(student_id, game_id):
 
     # ลบคะแนนเก่า (เพื่อให้เล่นใหม่)
     GameScore.query.filter_by(user_id=student_id, game_id=game_id).delete()
+    refresh_user(student_id)
     db.session.commit()
 
     flash(f"✅ อนุมัติให้นักเรียน {student.name} เล่นเกม '{game.title}' ใหม่ได้แล้ว")
@@ -0,0 +1,31 @@
+import numpy as np
+
+from utils.vad import trim_silence
+
+SR = 16000
+
+
+def _tone(seconds, amplitude=0.3, freq=220.0):
+    t = np.arange(int(SR * seconds)) / SR
+    # สระเสียงยาว: ความถี่หลัก + harmonic
+    return (amplitude * (np.sin(2 * np.pi * freq * t) + 0.5 * np.sin(2 * np.pi * 2 * freq * t))).astype(np.float32)
+
+
+def test_all_speech_clip_is_kept():
+    audio = _tone(1.5)
+    result = trim_silence(audio, sr=SR)
+    assert result is not None
+    assert len(result) >= len(audio) - SR * 0.03
+
+
+def test_silence_is_rejected():
+    audio = np.random.default_rng(0).normal(0, 1e-4, SR).astype(np.float32)
+    assert trim_silence(audio, sr=SR) is None
+
+
+def test_leading_and_trailing_silence_is_trimmed():
+    silence = np.zeros(SR, dtype=np.float32)
+    audio = np.concatenate([silence, _tone(0.5), silence])
+    result = trim_silence(audio, sr=SR, pad_ms=0)
+    assert result is not None
+    assert abs(len(result) - SR * 0.5) <= SR * 0.03
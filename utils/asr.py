@@ -0,0 +1,72 @@
+import threading, time
+
+
+class WhisperBackend:
+    """ openai-whisper (PyTorch) — backend เดิมของระบบ """
+    name = "whisper"
+    thread_safe = False
+
+    def __init__(self, model_size, **_):
+        import whisper
+        t0 = time.time()
+        self.model_size = model_size
+        self.model = whisper.load_model(model_size)
+        self.load_seconds = time.time() - t0
+
+    def transcribe(self, audio, lang):
+        return self.model.transcribe(audio, fp16=False, language=lang)["text"].strip()
+
+    def transcribe_batch(self, audios, lang):
+        from utils.asr_batcher import whisper_decode_batch
+        return whisper_decode_batch(self.model, audios, lang)
+
+
+class FasterWhisperBackend:
+    """ faster-whisper (CTranslate2) แบบ int8 บน CPU — เร็วกว่าบนเครื่องที่ไม่มี GPU """
+    name = "faster-whisper"
+    thread_safe = True
+
+    def __init__(self, model_size, compute_type="int8", cpu_threads=0, **_):
+        from faster_whisper import WhisperModel
+        t0 = time.time()
+        self.model_size = model_size
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+        self.load_seconds = time.time() - t0
+
+    def transcribe(self, audio, lang):
+        segments, _ = self.model.transcribe(audio, language=lang, beam_size=1)
+        return "".join(s.text for s in segments).strip()
+
+    def transcribe_batch(self, audios, lang):
+        return [self.transcribe(a, lang) for a in audios]
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def get_backend(name, model_size, **options):
+    """ โหลด backend ครั้งเดียวต่อ (ชื่อ backend, ขนาดโมเดล) แล้วใช้ซ้ำ """
+    if name not in BACKENDS:
+        raise ValueError(f"unknown ASR backend: {name} (มี {', '.join(BACKENDS)})")
+    key = (name, model_size)
+    with _lock:
+        if key not in _instances:
+            backend = BACKENDS[name](model_size, **options)
+            backend.lock = threading.Lock()
+            _instances[key] = backend
+        return _instances[key]
+
+
+def loaded_backends():
+    """ รายการ backend ที่โหลดแล้วพร้อมเวลาโหลด (ใช้ใน /stats และ benchmark) """
+    with _lock:
+        return [
+            {"backend": b.name, "model": b.model_size, "load_seconds": round(b.load_seconds, 2)}
+            for b in _instances.values()
+        ]
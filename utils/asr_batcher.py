@@ -0,0 +1,94 @@
+import queue, threading, time
+from concurrent.futures import Future
+
+
+class TranscriptionBatcher:
+    """
+    รวมคลิปเสียงที่เข้ามาในช่วงเวลาสั้น ๆ แล้วถอดเสียงพร้อมกันเป็น batch
+    - max_batch: จำนวนคลิปสูงสุดต่อ batch
+    - max_wait_ms: เวลารอสูงสุดนับจากคลิปแรกของ batch (เพดาน latency ที่เพิ่มขึ้น)
+    decode_batch(audios, lang) ต้องคืน list ของข้อความตามลำดับเดิม
+    มี thread เดียวที่เรียกโมเดล จึงไม่ต้องใช้ lock ครอบโมเดลเพิ่ม
+    """
+
+    def __init__(self, decode_batch, max_batch=8, max_wait_ms=50):
+        self.decode_batch = decode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._stats = {"batches": 0, "clips": 0, "max_batch_seen": 0}
+        threading.Thread(target=self._loop, name="asr-batcher", daemon=True).start()
+
+    def submit(self, audio, lang="en"):
+        fut = Future()
+        self._queue.put((audio, lang, fut))
+        return fut
+
+    def transcribe(self, audio, lang="en", timeout=None):
+        return self.submit(audio, lang).result(timeout=timeout)
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        # แยกตามภาษา เพราะ decode ทั้ง batch ใช้ภาษาเดียวกัน
+        by_lang = {}
+        for audio, lang, fut in batch:
+            by_lang.setdefault(lang, []).append((audio, fut))
+
+        for lang, jobs in by_lang.items():
+            try:
+                texts = self.decode_batch([a for a, _ in jobs], lang)
+                for (_, fut), text in zip(jobs, texts):
+                    fut.set_result(text)
+            except Exception as e:
+                for _, fut in jobs:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+        self._stats["batches"] += 1
+        self._stats["clips"] += len(batch)
+        self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+
+    def stats(self):
+        s = dict(self._stats)
+        s["avg_batch"] = round(s["clips"] / s["batches"], 2) if s["batches"] else 0
+        s["pending"] = self._queue.qsize()
+        return s
+
+
+def whisper_decode_batch(model, audios, lang):
+    """
+    ถอดเสียงหลายคลิปด้วย forward pass เดียวของ openai-whisper
+    คลิปที่ยาวเกิน 30 วินาทีใช้ transcribe() ปกติ (decode รองรับแค่หน้าต่างเดียว)
+    """
+    import torch, whisper
+
+    n_mels = getattr(model.dims, "n_mels", 80)
+    texts = [None] * len(audios)
+    mels, idx = [], []
+    for i, a in enumerate(audios):
+        audio = whisper.load_audio(a) if isinstance(a, str) else a
+        if len(audio) > whisper.audio.N_SAMPLES:
+            texts[i] = model.transcribe(audio, fp16=False, language=lang)["text"].strip()
+            continue
+        mels.append(whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels))
+        idx.append(i)
+
+    if mels:
+        options = whisper.DecodingOptions(language=lang, fp16=False, without_timestamps=True)
+        results = whisper.decode(model, torch.stack(mels).to(model.device), options)
+        for i, r in zip(idx, results):
+            texts[i] = r.text.strip()
+    return texts
@@ -0,0 +1,130 @@
+import os, subprocess, tempfile
+
+SAMPLE_RATE = 16000
+
+
+class AudioDecodeError(Exception):
+    """ ffmpeg ถอดรหัสไฟล์เสียงไม่ได้ """
+
+
+def decode_audio_bytes(data, sr=SAMPLE_RATE):
+    """
+    ถอดรหัสเสียง (WebM/Opus, MP3, WAV ฯลฯ) จาก bytes เป็น float32 mono 16 kHz
+    ป้อน ffmpeg ผ่าน stdin/stdout ทั้งหมด ไม่เขียนไฟล์ลงดิสก์
+    """
+    import numpy as np
+
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr),
+        "pipe:1",
+    ]
+    try:
+        proc = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise AudioDecodeError("ไม่พบ ffmpeg ในเครื่อง")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(e.stderr.decode("utf-8", "ignore").strip() or "ffmpeg failed")
+
+    return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def load_audio(audio, sr=SAMPLE_RATE):
+    """ รับได้ทั้ง path, bytes หรือ numpy array แล้วคืน float32 array """
+    if isinstance(audio, (bytes, bytearray)):
+        return decode_audio_bytes(bytes(audio), sr)
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            return decode_audio_bytes(f.read(), sr)
+    return audio
+
+
+# 🔊 เสียงที่แอดมินอัปโหลด (ข้อจับคู่): ตัดช่วงเงียบหัว-ท้าย ปรับความดังให้เท่ากัน (EBU R128)
+# แล้วแปลงเป็นไฟล์เล็ก ๆ mono — AAC (.m4a เล่นได้ทุกเบราว์เซอร์) หรือ Opus (.webm เล็กกว่า) ตาม AUDIO_FORMAT
+TRIM_SILENCE = "silenceremove=start_periods=1:start_threshold=-50dB:start_silence=0.05"
+PLAYBACK_FILTER = f"{TRIM_SILENCE},areverse,{TRIM_SILENCE},areverse,loudnorm=I=-16:TP=-1.5:LRA=11"
+PLAYBACK_FORMATS = {
+    "aac": (".m4a", ["-c:a", "aac", "-b:a", "64k", "-movflags", "+faststart"]),
+    "opus": (".webm", ["-c:a", "libopus", "-b:a", "32k", "-application", "voip"]),
+}
+
+
+def _duration_ms(path, timeout=None):
+    try:
+        proc = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            capture_output=True, text=True, timeout=timeout,
+        )
+        return round(float(proc.stdout.strip()) * 1000)
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def transcode_for_playback(data, fmt="aac", timeout=None):
+    """ คืน (bytes, นามสกุล, ความยาว ms) ของเสียงที่ตัดเงียบ + ปรับความดัง + บีบอัดแล้ว (timeout วินาที) """
+    ext, codec = PLAYBACK_FORMATS[fmt]
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out" + ext)
+        cmd = [
+            "ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error",
+            "-i", "pipe:0", "-vn", "-af", PLAYBACK_FILTER, "-ac", "1", "-ar", "48000",
+            *codec, out,
+        ]
+        try:
+            subprocess.run(cmd, input=data, capture_output=True, check=True, timeout=timeout)
+        except FileNotFoundError:
+            raise AudioDecodeError("ไม่พบ ffmpeg ในเครื่อง")
+        except subprocess.TimeoutExpired:
+            raise AudioDecodeError(f"ffmpeg ใช้เวลาเกิน {timeout} วินาที")
+        except subprocess.CalledProcessError as e:
+            raise AudioDecodeError(e.stderr.decode("utf-8", "ignore").strip() or "ffmpeg failed")
+        with open(out, "rb") as f:
+            return f.read(), ext, _duration_ms(out, timeout)
+
+
+def save_audio_upload(file_storage):
+    """
+    แปลงเสียงที่อัปโหลดแล้วเก็บลง media store คืนพาธ 'media/..' สำหรับบันทึกในคอลัมน์
+    ถ้าแปลงไม่ได้ (ไม่มี ffmpeg / ไฟล์แปลก) เก็บไฟล์ต้นฉบับแทน
+    """
+    from config import Config
+    from utils import media_store
+
+    data = file_storage.read()
+    try:
+        encoded, ext, duration_ms = transcode_for_playback(data, Config.AUDIO_FORMAT)
+    except AudioDecodeError as e:
+        print("⚠️ audio transcode failed:", file_storage.filename, e)
+        return media_store.put(data, file_storage.filename)
+    return media_store.put(encoded, "audio" + ext, duration_ms=duration_ms)
+
+
+def transcode_existing(force=False):
+    """
+    แปลงเสียงข้อจับคู่ที่มีอยู่แล้ว (ไฟล์เดิม / ไฟล์ใน store ที่ยังไม่ผ่านการแปลง) คืน (จำนวนที่แปลง, จำนวนที่ข้าม)
+    ไฟล์ที่แปลงแล้ว (มี duration_ms) จะข้าม เว้นแต่ force=True
+    """
+    from config import Config
+    from models import db, MatchingItem
+    from utils import media_store
+
+    converted, skipped = 0, 0
+    for item in MatchingItem.query.filter(MatchingItem.question_audio.isnot(None), MatchingItem.question_audio != "").all():
+        old = item.question_audio
+        if media_store.is_stored(old) and not force:
+            asset = media_store.MediaAsset.query.filter_by(path=old).first()
+            if asset is not None and asset.duration_ms is not None:
+                continue
+        source = media_store.disk_path(old if media_store.is_stored(old) else media_store.legacy_path(old, "audio"))
+        try:
+            with open(source, "rb") as f:
+                encoded, ext, duration_ms = transcode_for_playback(f.read(), Config.AUDIO_FORMAT)
+        except (OSError, AudioDecodeError) as e:
+            print(f"⚠️ {old}: {e}")
+            skipped += 1
+            continue
+        item.question_audio = media_store.put(encoded, "audio" + ext, duration_ms=duration_ms)
+        db.session.commit()
+        converted += 1
+    return converted, skipped
@@ -0,0 +1,42 @@
+# ค่ามาตรฐานของภาษาและประเภทคำถาม — แปลงตอนบันทึก เพื่อให้ตอนอ่านค้นด้วย = บนคอลัมน์ที่มี index ได้
+
+LANGS = ["en", "zh"]
+TEST_TYPES = ["pre", "post", "test", "game"]
+
+_LANG_ALIASES = {
+    "en": "en", "eng": "en", "english": "en", "en-us": "en", "en_us": "en", "en-gb": "en", "อังกฤษ": "en",
+    "zh": "zh", "cn": "zh", "chinese": "zh", "zh-cn": "zh", "zh_cn": "zh", "zh-hans": "zh",
+    "zh-tw": "zh", "中文": "zh", "จีน": "zh",
+}
+
+
+def lang_code(value):
+    """ 'English' / 'EN' / 'zh-CN' / 'zh-HK' / '中文' → 'en' หรือ 'zh' — ค่าที่ไม่รู้จัก (หรือว่าง) คืน None """
+    key = (value or "").strip().lower()
+    if key in _LANG_ALIASES:
+        return _LANG_ALIASES[key]
+    # รหัสภาษาแบบมีภูมิภาคต่อท้าย (en-au, zh_hk, ...)
+    if len(key) > 3 and key[:2] in LANGS and key[2] in "-_":
+        return key[:2]
+    return None
+
+
+def canonical_lang(value, default="en"):
+    """ เหมือน lang_code แต่ค่าที่ไม่รู้จักคืน default (และเตือนใน log แทนการเดารหัสที่ไม่มี query ไหนค้นเจอ) """
+    code = lang_code(value)
+    if code is None:
+        if (value or "").strip():
+            print(f"⚠️ unknown lang {value!r} → {default!r}")
+        return default
+    return code
+
+
+def canonical_test_type(value, default="test"):
+    """ 'Pre' / 'pre_zh' → 'pre' (ภาษาเก็บในคอลัมน์ lang แล้ว ไม่ต้องมี _zh ต่อท้าย) """
+    key = (value or "").strip().lower()
+    if not key:
+        return default
+    for suffix in ("_zh", "_en"):
+        if key.endswith(suffix):
+            key = key[:-len(suffix)]
+    return key
@@ -0,0 +1,186 @@
+import pickle, threading, time
+from sqlalchemy.orm import Session, joinedload
+from config import Config
+from models import db, Lesson, Game, Exercise
+from utils.cache import TTLCache
+
+VERSION_KEY = "echolingo:content_version"
+
+
+class ContentVersion(db.Model):
+    """ ตัวนับเวอร์ชันของเนื้อหา (บทเรียน / เกม / ข้อ) แถวเดียว — แอดมินแก้ไขเมื่อไหร่ก็เพิ่มขึ้น 1 """
+    __tablename__ = "content_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+# cache ใน worker: key → (version, ค่า)
+_local = TTLCache(max_items=Config.CONTENT_CACHE_SIZE, ttl=Config.CONTENT_CACHE_TTL)
+_state = {"version": None, "checked": 0.0}
+_lock = threading.Lock()
+_redis = None
+
+
+def _shared():
+    """ backend กลาง (Redis) ถ้าตั้ง CONTENT_CACHE_URL ไว้ — ใช้ร่วมกันทุก worker / ทุกเครื่อง """
+    global _redis
+    if _redis is None and Config.CONTENT_CACHE_URL:
+        import redis
+        _redis = redis.Redis.from_url(Config.CONTENT_CACHE_URL)
+    return _redis
+
+
+def _read_version():
+    shared = _shared()
+    if shared is not None:
+        return int(shared.get(VERSION_KEY) or 0)
+    row = db.session.get(ContentVersion, 1)
+    return row.version if row else 0
+
+
+def current_version():
+    """ เวอร์ชันเนื้อหาปัจจุบัน (อ่านจากแหล่งกลางไม่เกินทุก CONTENT_VERSION_CHECK_S วินาทีต่อ worker) """
+    now = time.monotonic()
+    with _lock:
+        if _state["version"] is not None and now - _state["checked"] < Config.CONTENT_VERSION_CHECK_S:
+            return _state["version"]
+    version = _read_version()
+    with _lock:
+        _state.update(version=version, checked=now)
+    return version
+
+
+def content_changed():
+    """ เพิ่มเวอร์ชันเพื่อให้ทุก worker โหลดเนื้อหาใหม่ (เขียนผ่าน connection แยก ไม่แตะ session ของผู้เรียก) """
+    shared = _shared()
+    if shared is not None:
+        shared.incr(VERSION_KEY)
+    else:
+        table = ContentVersion.__table__
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                table.update().where(table.c.id == 1).values(version=table.c.version + 1)
+            ).rowcount
+            if not updated:
+                conn.execute(table.insert().values(id=1, version=1))
+    _local.clear()
+    with _lock:
+        _state["version"] = None
+
+
+# 🔔 เพิ่มเวอร์ชันอัตโนมัติเมื่อ commit ที่แก้ตารางเนื้อหาสำเร็จ (ไม่ขึ้นกับ route / status ของ response)
+CONTENT_TABLES = {
+    "lesson", "game", "exercise", "game_item", "matching_item", "fill_in_blank",
+    "scramble_item", "choice_item", "speech_question", "tts_clip",
+}
+_FLAG = "content_changed"
+
+
+def _touches_content(objects):
+    return any(getattr(getattr(o, "__table__", None), "name", None) in CONTENT_TABLES for o in objects)
+
+
+@db.event.listens_for(Session, "before_flush")
+def _mark_flush(session, flush_context, instances):
+    if _touches_content(session.new) or _touches_content(session.dirty) or _touches_content(session.deleted):
+        session.info[_FLAG] = True
+
+
+@db.event.listens_for(Session, "do_orm_execute")
+def _mark_bulk(state):
+    # query.update() / query.delete() ไม่ผ่าน flush
+    if (state.is_update or state.is_delete) and state.bind_mapper is not None \
+            and state.bind_mapper.local_table.name in CONTENT_TABLES:
+        state.session.info[_FLAG] = True
+
+
+@db.event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    if session.info.pop(_FLAG, False):
+        try:
+            content_changed()
+        except Exception as e:  # commit สำเร็จแล้ว — อย่างช้าที่สุด cache หมดอายุเองตาม CONTENT_CACHE_TTL
+            print("⚠️ content version bump failed:", e)
+
+
+@db.event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session):
+    session.info.pop(_FLAG, None)
+
+
+def _cached(key, load):
+    """
+    อ่านผ่าน cache: worker → Redis (ถ้ามี) → ฐานข้อมูล
+    โหลดด้วย session แยกแล้วปิดทันที ออบเจกต์ที่ได้จึงเป็น detached และไม่ถูก expire ตอน request commit
+    """
+    version = current_version()
+    entry = _local.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    shared = _shared()
+    shared_key = f"echolingo:content:{version}:{key}"
+    if shared is not None:
+        raw = shared.get(shared_key)
+        if raw is not None:
+            value = pickle.loads(raw)
+            _local.set(key, (version, value))
+            return value
+
+    with Session(db.engine) as session:
+        value = load(session)
+    if shared is not None:
+        shared.set(shared_key, pickle.dumps(value), ex=Config.CONTENT_CACHE_TTL)
+    _local.set(key, (version, value))
+    return value
+
+
+def derived(key, build):
+    """ ค่าที่คำนวณจากเนื้อหา (เช่น payload ของเกม) — cache ตามเวอร์ชันเดียวกับเนื้อหา """
+    return _cached(key, lambda _session: build())
+
+
+def lessons_by_lang(lang):
+    return list(_cached(
+        f"lessons:{lang}",
+        lambda s: s.query(Lesson).filter_by(lang=lang).order_by(Lesson.id).all()
+    ))
+
+
+def get_lesson(lesson_id):
+    return _cached(f"lesson:{lesson_id}", lambda s: s.get(Lesson, lesson_id))
+
+
+def get_game(game_id):
+    """ เกม (พร้อม game.lesson) หรือ None """
+    return _cached(
+        f"game:{game_id}",
+        lambda s: s.query(Game).options(joinedload(Game.lesson)).filter_by(id=game_id).first()
+    )
+
+
+def games_by_lesson(lesson_id):
+    return list(_cached(
+        f"games:{lesson_id}",
+        lambda s: s.query(Game).filter_by(lesson_id=lesson_id).order_by(Game.id).all()
+    ))
+
+
+def get_items(model, game_id):
+    """ ข้อของเกม (MatchingItem, GameItem, ...) — คืน list ใหม่ทุกครั้ง สับลำดับได้ไม่กระทบ cache """
+    return list(_cached(
+        f"items:{model.__tablename__}:{game_id}",
+        lambda s: s.query(model).filter_by(game_id=game_id).order_by(model.id).all()
+    ))
+
+
+def get_quiz_questions(lesson_id, lang):
+    """ คำถาม Exercise ของเกมควิซ (question_type='game') ในบทเรียน / ภาษา """
+    return list(_cached(
+        f"quiz:{lesson_id}:{lang}",
+        lambda s: s.query(Exercise)
+        .filter_by(lesson_id=lesson_id, question_type="game", lang=lang)
+        .order_by(Exercise.id)
+        .all()
+    ))
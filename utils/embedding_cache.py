@@ -0,0 +1,60 @@
+import hashlib, os, threading
+from collections import OrderedDict
+
+
+class EmbeddingCache:
+    """
+    cache เวกเตอร์ของคำตอบอ้างอิง (SpeechQuestion.correct_answer)
+    - key = sha256(ชื่อโมเดล + ข้อความ) → แก้คำตอบแล้ว key เปลี่ยนเอง
+    - เก็บเป็นไฟล์ .npy ใน cache_dir (อยู่รอดข้ามการ restart) และมี LRU ในหน่วยความจำด้านหน้า
+    - เวกเตอร์ถูก normalize แล้ว → similarity = dot product
+    """
+
+    def __init__(self, cache_dir, max_items=2048):
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(text, model_name):
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def get(self, text, model_name, encode):
+        import numpy as np
+
+        key = self.key(text, model_name)
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                return self._mem[key]
+
+        path = self._path(key)
+        if os.path.exists(path):
+            vec = np.load(path)
+        else:
+            vec = np.asarray(encode(text), dtype=np.float32)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, vec)
+            os.replace(tmp, path)
+
+        with self._lock:
+            self._mem[key] = vec
+            if len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+        return vec
+
+    def invalidate(self, text, model_name):
+        key = self.key(text, model_name)
+        with self._lock:
+            self._mem.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
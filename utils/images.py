@@ -0,0 +1,138 @@
+import base64, io, json, os
+from config import Config
+from utils.cache import TTLCache
+
+# รูปคำถาม / ข้อในเกม: เก็บต้นฉบับไว้เหมือนเดิม แล้วสร้างไฟล์ย่อหลายขนาด (WebP และ AVIF ถ้ามี)
+# + placeholder เล็ก ๆ ไว้ใน static/images/variants/<ชื่อไฟล์>/ พร้อม manifest.json
+# template เรียก responsive_image() ให้ได้ <picture> พร้อม srcset
+
+STATIC_ROOT = "static"
+VARIANT_DIR = "variants"
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"}
+PLACEHOLDER_WIDTH = 16
+
+_manifests = TTLCache(max_items=4096, ttl=Config.IMAGE_MANIFEST_TTL)
+
+
+def _formats():
+    """ รูปแบบที่ Pillow บันทึกได้ในเครื่องนี้ (AVIF ต้องมี Pillow ที่รองรับ หรือ pillow-avif-plugin) """
+    from PIL import Image
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    Image.init()
+    formats = [("avif", {"quality": 55})] if "AVIF" in Image.SAVE else []
+    return formats + [("webp", {"quality": 80, "method": 6})]
+
+
+def _variant_dir(rel_path):
+    """ images/abc.png → images/variants/abc.png """
+    folder, name = os.path.split(rel_path)
+    return os.path.join(folder, VARIANT_DIR, name)
+
+
+def static_path(path):
+    """ รับได้ทั้ง 'images/x.png' และ 'x.png' (GameItem.image_name) → พาธใต้ static/ """
+    path = (path or "").lstrip("/")
+    if path.startswith(STATIC_ROOT + "/"):
+        path = path[len(STATIC_ROOT) + 1:]
+    return path if "/" in path else f"images/{path}"
+
+
+def build_variants(rel_path, force=False):
+    """
+    สร้างไฟล์ย่อของรูป static/<rel_path> ตาม IMAGE_WIDTHS (ไม่ขยายเกินขนาดจริง)
+    คืน manifest (dict) หรือ None ถ้าไม่ใช่ไฟล์รูป
+    """
+    from PIL import Image, ImageOps
+
+    rel_path = static_path(rel_path)
+    source = os.path.join(STATIC_ROOT, rel_path)
+    if os.path.splitext(source)[1].lower() not in IMAGE_EXTS or not os.path.isfile(source):
+        return None
+
+    out_rel = _variant_dir(rel_path)
+    out_dir = os.path.join(STATIC_ROOT, out_rel)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if not force and os.path.exists(manifest_path) and os.path.getmtime(manifest_path) >= os.path.getmtime(source):
+        return read_manifest(rel_path)
+
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+        width, height = img.size
+
+        manifest = {"width": width, "height": height, "sources": {}}
+        widths = sorted({w for w in Config.IMAGE_WIDTHS if w < width} | {min(width, max(Config.IMAGE_WIDTHS))})
+        for fmt, options in _formats():
+            entries = []
+            for w in widths:
+                h = max(1, round(height * w / width))
+                name = f"{w}.{fmt}"
+                img.resize((w, h), Image.LANCZOS).save(os.path.join(out_dir, name), fmt.upper(), **options)
+                entries.append([f"{out_rel}/{name}", w])
+            manifest["sources"][fmt] = entries
+
+        thumb = img.resize((PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR)
+        buf = io.BytesIO()
+        thumb.save(buf, "WEBP", quality=30)
+        manifest["placeholder"] = "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode()
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    _manifests.pop(rel_path)
+    return manifest
+
+
+def read_manifest(rel_path):
+    """ manifest ของรูป (cache ในหน่วยความจำ) หรือ None ถ้ายังไม่ได้แปลง """
+    rel_path = static_path(rel_path)
+    cached = _manifests.get(rel_path)
+    if cached is not None:
+        return cached or None
+    try:
+        with open(os.path.join(STATIC_ROOT, _variant_dir(rel_path), "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    _manifests.set(rel_path, manifest)
+    return manifest or None
+
+
+def save_upload(file_storage):
+    """
+    บันทึกรูปที่อัปโหลดลง media store (ชื่อตาม hash — รูปซ้ำเก็บครั้งเดียว) แล้วสร้างไฟล์ย่อทันที
+    คืนพาธสำหรับเก็บในฐานข้อมูล เช่น 'media/ab/<sha256>.png'
+    """
+    from utils.media_store import put
+    rel_path = put(file_storage, file_storage.filename)
+    try:
+        build_variants(rel_path)
+    except Exception as e:  # รูปเสีย / Pillow ไม่มี → ยังใช้ต้นฉบับได้
+        print("⚠️ image variants failed:", rel_path, e)
+    return rel_path
+
+
+def convert_all(folders=None, force=False):
+    """ แปลงรูปที่มีอยู่แล้ว (static/images และ media store, ข้ามโฟลเดอร์ variants) คืน (จำนวน, ขนาดเดิม, ขนาด webp ที่ใหญ่สุด) """
+    folders = folders or [Config.UPLOAD_FOLDER, os.path.join(STATIC_ROOT, "media")]
+    converted, original_bytes, variant_bytes = 0, 0, 0
+    for root in folders:
+        for folder, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if d != VARIANT_DIR)
+            for name in sorted(files):
+                path = os.path.join(folder, name)
+                rel_path = os.path.relpath(path, STATIC_ROOT).replace(os.sep, "/")
+                try:
+                    manifest = build_variants(rel_path, force=force)
+                except Exception as e:
+                    print(f"⚠️ {rel_path}: {e}")
+                    continue
+                if manifest:
+                    converted += 1
+                    original_bytes += os.path.getsize(path)
+                    largest = manifest["sources"]["webp"][-1][0]
+                    variant_bytes += os.path.getsize(os.path.join(STATIC_ROOT, largest))
+    return converted, original_bytes, variant_bytes
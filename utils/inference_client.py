@@ -0,0 +1,70 @@
+import http.client, json, socket
+from urllib.parse import urlsplit, urlencode
+
+PCM_CONTENT_TYPE = "audio/x-f32le; rate=16000"
+
+
+class InferenceError(Exception):
+    """ inference_server ตอบกลับผิดพลาดหรือเชื่อมต่อไม่ได้ """
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class InferenceClient:
+    """
+    client บาง ๆ สำหรับเรียก inference_server.py
+    url: http://127.0.0.1:8765 หรือ unix:///run/echolingo/inference.sock
+    """
+
+    def __init__(self, url, timeout=60):
+        self.url = urlsplit(url)
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.url.scheme == "unix":
+            return _UnixHTTPConnection(self.url.path, self.timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+
+    def _post(self, path, body, content_type):
+        conn = self._connection()
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+            resp = conn.getresponse()
+            data = json.loads(resp.read() or b"{}")
+        except (OSError, ValueError) as e:
+            raise InferenceError(f"inference server unreachable: {e}")
+        finally:
+            conn.close()
+        if resp.status != 200:
+            raise InferenceError(data.get("error") or f"HTTP {resp.status}")
+        return data
+
+    def transcribe(self, audio, lang="en"):
+        # bytes ของไฟล์เสียงส่งไปตามเดิม (เล็กกว่า PCM), numpy array ส่งเป็น float32 ดิบ
+        if isinstance(audio, (bytes, bytearray)):
+            body, content_type = bytes(audio), "application/octet-stream"
+        else:
+            body, content_type = audio.astype("float32").tobytes(), PCM_CONTENT_TYPE
+        data = self._post("/transcribe?" + urlencode({"lang": lang}), body, content_type)
+        return data["text"]
+
+    def similarity(self, text1, text2, model=None):
+        body = json.dumps({"text1": text1, "text2": text2, "model": model}).encode("utf-8")
+        return self._post("/similarity", body, "application/json")["score"]
+
+    def reference_similarity(self, transcript, reference, model=None):
+        body = json.dumps({"transcript": transcript, "reference": reference, "model": model}).encode("utf-8")
+        return self._post("/reference_similarity", body, "application/json")["score"]
+
+    def reference(self, text, model=None, action="warm"):
+        body = json.dumps({"text": text, "model": model, "action": action}).encode("utf-8")
+        return self._post("/reference", body, "application/json")
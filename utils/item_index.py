@@ -0,0 +1,106 @@
+from config import Config
+from models import db, Game
+from utils.cache import TTLCache
+from utils.score_loader import item_counts, QUIZ_TYPES
+
+
+class GameItemCount(db.Model):
+    """ ดัชนีจำนวนข้อของแต่ละเกม (คะแนนเต็ม) — แอดมินเพิ่ม/ลบข้อแล้วอัปเดตทันที """
+    __tablename__ = "game_item_count"
+
+    game_id = db.Column(db.Integer, db.ForeignKey(Game.id, ondelete="CASCADE"), primary_key=True)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# cache ในหน่วยความจำด้านหน้าตาราง (หมดอายุตาม ITEM_COUNT_CACHE_TTL เพื่อให้ worker อื่นเห็นการแก้ไข)
+_cache = TTLCache(max_items=4096, ttl=Config.ITEM_COUNT_CACHE_TTL)
+
+
+def get_counts(games):
+    """ คืน {game_id: จำนวนข้อ} จาก cache → ตารางดัชนี → นับจริง (แล้วเก็บลงดัชนี) ตามลำดับ """
+    counts, missing = {}, []
+    for g in games:
+        n = _cache.get(g.id)
+        if n is None:
+            missing.append(g)
+        else:
+            counts[g.id] = n
+    if not missing:
+        return counts
+
+    rows = GameItemCount.query.filter(GameItemCount.game_id.in_([g.id for g in missing])).all()
+    found = {r.game_id: r.item_count for r in rows}
+    unindexed = [g for g in missing if g.id not in found]
+    if unindexed:
+        computed = item_counts(unindexed)
+        _store_missing(computed)
+        found.update(computed)
+
+    for game_id, n in found.items():
+        _cache.set(game_id, n)
+    counts.update(found)
+    return counts
+
+
+def _store_missing(counts):
+    """
+    เก็บจำนวนที่นับได้ระหว่างอ่านลงดัชนีใน transaction แยก (ไม่ commit งานอื่นที่ค้างใน session ของ request)
+    ใช้ INSERT ... ON CONFLICT DO NOTHING → หลาย worker เติมเกมเดียวกันพร้อมกันก็ไม่ชนกัน
+    """
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return  # ฐานข้อมูลอื่น: ให้ refresh_* / rebuild เป็นคนเขียนดัชนี
+    stmt = insert(GameItemCount.__table__).values(
+        [{"game_id": k, "item_count": v} for k, v in counts.items()]
+    ).on_conflict_do_nothing(index_elements=["game_id"])
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(stmt)
+    except Exception as e:  # เขียนดัชนีไม่ได้ก็ยังแสดงหน้าได้ (นับใหม่รอบหน้า)
+        print("⚠️ item count index write failed:", e)
+
+
+def get_count(game):
+    return get_counts([game])[game.id]
+
+
+def refresh_game(game):
+    """ นับข้อของเกมใหม่แล้วเขียนลงดัชนีใน session ปัจจุบัน (commit พร้อมการแก้ไขของแอดมิน) """
+    if isinstance(game, int):
+        game = Game.query.get(game)
+        if game is None:
+            return
+    n = item_counts([game])[game.id]
+    db.session.merge(GameItemCount(game_id=game.id, item_count=n))
+    _cache.pop(game.id)
+
+
+def refresh_lesson_quizzes(lesson_id):
+    """ คำถาม Exercise ของบทเรียนเปลี่ยน → นับใหม่ให้เกมควิซทุกเกมในบทนั้น """
+    for game in Game.query.filter_by(lesson_id=lesson_id).all():
+        if (game.game_type or "").strip().lower() in QUIZ_TYPES:
+            refresh_game(game)
+
+
+def drop_game(game_id):
+    """ ลบแถวดัชนีของเกมที่ถูกลบ (SQLite ไม่ได้เปิด FK cascade เสมอไป) """
+    GameItemCount.query.filter_by(game_id=game_id).delete(synchronize_session=False)
+    _cache.pop(game_id)
+
+
+def rebuild():
+    """ คำนวณดัชนีใหม่ทั้งหมด """
+    GameItemCount.__table__.create(db.engine, checkfirst=True)
+    GameItemCount.query.delete(synchronize_session=False)
+    games = Game.query.all()
+    counts = item_counts(games)
+    db.session.bulk_insert_mappings(
+        GameItemCount, [{"game_id": k, "item_count": v} for k, v in counts.items()]
+    )
+    db.session.commit()
+    _cache.clear()
+    return len(counts)
@@ -0,0 +1,143 @@
+from models import db, User, Game, GameScore
+
+ALL_LANGS = "*"   # แถวรวมทุกภาษา
+ALL_LESSONS = 0   # แถวรวมทุกบทเรียน (ของภาษานั้น)
+
+
+class LeaderboardTotal(db.Model):
+    """
+    ตารางคะแนนรวมสำเร็จรูปต่อนักเรียน (denormalized) อัปเดตพร้อมกับ GameScore ใน transaction เดียวกัน
+    แต่ละนักเรียนมีแถว: ต่อบทเรียน, รวมต่อภาษา (lesson_id=0) และรวมทั้งหมด (lang='*', lesson_id=0)
+    """
+    __tablename__ = "leaderboard_total"
+
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id, ondelete="CASCADE"), primary_key=True)
+    lang = db.Column(db.String(8), primary_key=True)
+    lesson_id = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+def _lesson_totals(user_id=None):
+    """ คะแนนรวมต่อ (นักเรียน, ภาษา, บทเรียน) จากคะแนนที่ดีที่สุดของแต่ละเกม """
+    best = (
+        db.session.query(
+            GameScore.user_id.label("user_id"),
+            Game.lang.label("lang"),
+            Game.lesson_id.label("lesson_id"),
+            db.func.max(GameScore.score).label("score"),
+        )
+        .join(Game, Game.id == GameScore.game_id)
+        .group_by(GameScore.user_id, GameScore.game_id, Game.lang, Game.lesson_id)
+    )
+    if user_id is not None:
+        best = best.filter(GameScore.user_id == user_id)
+    best = best.subquery()
+
+    return (
+        db.session.query(best.c.user_id, best.c.lang, best.c.lesson_id, db.func.sum(best.c.score))
+        .join(User, User.id == best.c.user_id)
+        .filter(User.role == "student")
+        .group_by(best.c.user_id, best.c.lang, best.c.lesson_id)
+        .all()
+    )
+
+
+def _materialize(rows):
+    """ แปลงผลรวมต่อบทเรียนเป็นแถวของตาราง พร้อมแถวรวมต่อภาษาและรวมทั้งหมด """
+    totals = {}
+    for user_id, lang, lesson_id, total in rows:
+        lang = lang or "en"
+        for key in [(user_id, lang, lesson_id), (user_id, lang, ALL_LESSONS), (user_id, ALL_LANGS, ALL_LESSONS)]:
+            totals[key] = totals.get(key, 0) + int(total or 0)
+    return [
+        {"user_id": u, "lang": lang, "lesson_id": lesson, "total": total}
+        for (u, lang, lesson), total in totals.items()
+    ]
+
+
+def refresh_user(user_id):
+    """
+    คำนวณแถวของนักเรียนหนึ่งคนใหม่ใน session ปัจจุบัน (ยังไม่ commit)
+    เรียกหลังแก้ GameScore แล้วค่อย commit พร้อมกัน
+    ล็อกแถว User ก่อน → การบันทึกคะแนนของนักเรียนคนเดียวกันพร้อมกันจะทำทีละรายการ
+    (รายการหลังรอจน commit แล้วจึงเห็นคะแนน / แถวของรายการแรก ไม่ชน primary key และไม่ได้ผลรวมที่ขาดเกมอื่น)
+    """
+    db.session.query(User.id).filter(User.id == user_id).with_for_update().first()
+    LeaderboardTotal.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    rows = _materialize(_lesson_totals(user_id))
+    if rows:
+        db.session.bulk_insert_mappings(LeaderboardTotal, rows)
+
+
+def rebuild():
+    """ ล้างแล้วคำนวณตารางใหม่ทั้งหมดจาก GameScore (ใช้ตอนติดตั้งหรือเมื่อสงสัยว่าข้อมูลเพี้ยน) """
+    LeaderboardTotal.__table__.create(db.engine, checkfirst=True)
+    LeaderboardTotal.query.delete(synchronize_session=False)
+    rows = _materialize(_lesson_totals())
+    if rows:
+        db.session.bulk_insert_mappings(LeaderboardTotal, rows)
+    db.session.commit()
+    return len(rows)
+
+
+def get_ranking(school, classroom=None, lang=None, lesson_id=None, page=1, per_page=50):
+    """
+    จัดอันดับนักเรียนในโรงเรียนจากตาราง leaderboard_total (อ่านตาม index ไม่ต้องรวม GameScore ใหม่)
+    - อันดับแบบเสมอกันได้ (RANK: 1, 1, 3)
+    - แบ่งหน้า, กรองห้อง / ภาษา / บทเรียน
+    จำนวน query คงที่ไม่ขึ้นกับจำนวนนักเรียนหรือเกม
+    """
+    scope = [LeaderboardTotal.user_id == User.id]
+    if lesson_id:
+        scope.append(LeaderboardTotal.lesson_id == lesson_id)
+    else:
+        scope += [LeaderboardTotal.lang == (lang or ALL_LANGS), LeaderboardTotal.lesson_id == ALL_LESSONS]
+    total_col = db.func.coalesce(LeaderboardTotal.total, 0)
+
+    ranked = (
+        db.session.query(
+            User.id.label("user_id"),
+            total_col.label("total"),
+            db.func.rank().over(order_by=total_col.desc()).label("rank"),
+        )
+        .outerjoin(LeaderboardTotal, db.and_(*scope))
+        .filter(User.role == "student", User.school == school)
+    )
+    if classroom:
+        ranked = ranked.filter(User.classroom == classroom)
+    ranked = ranked.subquery()
+
+    count = db.session.query(db.func.count()).select_from(ranked).scalar() or 0
+    page = max(1, page)
+    rows = (
+        db.session.query(User, ranked.c.total, ranked.c.rank)
+        .join(ranked, ranked.c.user_id == User.id)
+        .order_by(ranked.c.rank, User.name)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+        .all()
+    )
+
+    return {
+        "rows": [{"student": u, "total": int(total), "rank": rank} for u, total, rank in rows],
+        "count": count,
+        "page": page,
+        "pages": max(1, -(-count // per_page)),
+    }
+
+
+def get_breakdown(user_ids, by="lang"):
+    """ คะแนนรวมแยกตามภาษา (by='lang') หรือบทเรียน (by='lesson') ของนักเรียนหลายคนใน query เดียว """
+    if not user_ids:
+        return {}
+    q = db.session.query(LeaderboardTotal).filter(LeaderboardTotal.user_id.in_(user_ids))
+    if by == "lang":
+        q = q.filter(LeaderboardTotal.lesson_id == ALL_LESSONS, LeaderboardTotal.lang != ALL_LANGS)
+    else:
+        q = q.filter(LeaderboardTotal.lesson_id != ALL_LESSONS)
+
+    result = {}
+    for row in q.all():
+        key = row.lang if by == "lang" else row.lesson_id
+        result.setdefault(row.user_id, {})[key] = row.total
+    return result
@@ -0,0 +1,87 @@
+import gzip, mimetypes, os
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+from config import Config
+
+# ส่งไฟล์สื่อ / static ให้เบราว์เซอร์ cache ได้ถูกต้อง
+# - ETag + If-None-Match → 304, Range → 206 (send_file แบบ conditional)
+# - ไฟล์ชื่อตาม hash → Cache-Control: immutable
+# - MEDIA_ACCEL=nginx → ส่ง X-Accel-Redirect ให้ Nginx ส่งไฟล์เอง (worker Python ไม่ต้องอ่านไฟล์)
+#   MEDIA_ACCEL=sendfile → X-Sendfile (Apache / lighttpd) ผ่าน USE_X_SENDFILE ของ Flask
+# - CSS ที่บีบอัดไว้ล่วงหน้า (.br / .gz) ส่งตาม Accept-Encoding
+
+PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+COMPRESSIBLE_EXTS = {".css", ".js", ".svg", ".json"}
+
+
+def _cache_headers(response, max_age, immutable):
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+def send_media(directory, path, max_age=0, immutable=False, etag=True):
+    """ ส่งไฟล์ directory/path (กัน path traversal) พร้อม ETag / Range / cache header """
+    full = safe_join(directory, path)
+    if full is None or not os.path.isfile(full):
+        abort(404)
+
+    if Config.MEDIA_ACCEL == "nginx":
+        # Nginx จัดการ Range / ETag / ส่งไฟล์เอง ตาม location internal ที่ชี้ไปยังโฟลเดอร์ static
+        response = current_app.response_class()
+        rel = os.path.relpath(full, Config.MEDIA_ACCEL_ROOT).replace(os.sep, "/")
+        response.headers["X-Accel-Redirect"] = Config.MEDIA_ACCEL_PREFIX.rstrip("/") + "/" + rel
+        response.headers["Content-Type"] = mimetypes.guess_type(full)[0] or "application/octet-stream"
+        return _cache_headers(response, max_age, immutable)
+
+    response = send_file(full, conditional=True, etag=etag, max_age=max_age)
+    return _cache_headers(response, max_age, immutable)
+
+
+def send_precompressed(directory, path, max_age=0):
+    """ ส่ง path.br / path.gz แทนไฟล์ต้นฉบับถ้าเบราว์เซอร์รับได้และไฟล์บีบอัดใหม่กว่าต้นฉบับ """
+    full = safe_join(directory, path)
+    if full is None or not os.path.isfile(full):
+        abort(404)
+
+    accepted = request.accept_encodings
+    for encoding, suffix in PRECOMPRESSED:
+        compressed = full + suffix
+        if accepted[encoding] and os.path.isfile(compressed) and os.path.getmtime(compressed) >= os.path.getmtime(full):
+            response = send_file(
+                compressed, conditional=True, max_age=max_age,
+                mimetype=mimetypes.guess_type(full)[0] or "application/octet-stream",
+            )
+            response.headers["Content-Encoding"] = encoding
+            response.vary.add("Accept-Encoding")
+            return _cache_headers(response, max_age, False)
+
+    response = send_media(directory, path, max_age=max_age)
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def precompress(directory):
+    """ สร้าง .gz (และ .br ถ้าติดตั้ง brotli) ของไฟล์ข้อความในโฟลเดอร์ คืนจำนวนไฟล์ที่บีบอัด """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    count = 0
+    for folder, _, files in os.walk(directory):
+        for name in files:
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTS:
+                continue
+            path = os.path.join(folder, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+            count += 1
+    return count
@@ -0,0 +1,279 @@
+import datetime, hashlib, mimetypes, os, shutil, time
+from sqlalchemy.orm import Session
+from models import db, Exercise, ChoiceItem, GameItem, MatchingItem
+
+# ที่เก็บไฟล์สื่อแบบตั้งชื่อตามเนื้อหา (sha256): static/media/<2 ตัวแรก>/<hash>.<ext>
+# ไฟล์เดียวกันอัปโหลดกี่ครั้งก็เก็บครั้งเดียว URL ไม่เปลี่ยนตลอดอายุไฟล์ → cache ฝั่งเบราว์เซอร์ได้ยาว
+# นับการใช้งานจากคอลัมน์สื่อทุกตาราง (MEDIA_COLUMNS) และลบไฟล์ที่ไม่มีใครใช้แล้วหลัง commit
+
+STATIC_ROOT = "static"
+MEDIA_PREFIX = "media/"
+EXT_ALIASES = {".jpeg": ".jpg", ".mpeg": ".mp3", ".mpga": ".mp3"}
+GC_GRACE_S = 3600  # ไฟล์ที่ยังไม่มีแถว (อาจกำลังอัปโหลด) ต้องเก่ากว่านี้ก่อนลบ
+
+mimetypes.add_type("audio/mp4", ".m4a")   # บางระบบไม่รู้จัก → send_file จะส่งเป็น octet-stream
+mimetypes.add_type("audio/webm", ".webm")
+
+# (คอลัมน์, ชนิด) ที่อ้างถึงไฟล์สื่อ — เพิ่มที่นี่เมื่อมีคอลัมน์สื่อใหม่
+MEDIA_COLUMNS = [
+    (Exercise.image_path, "image"),
+    (ChoiceItem.prompt_image, "image"),
+    (GameItem.image_name, "image"),
+    (MatchingItem.question_audio, "audio"),
+]
+
+
+class MediaAsset(db.Model):
+    __tablename__ = "media_asset"
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), unique=True, nullable=False)   # เช่น media/ab/ab12...ef.png (ใต้ static/)
+    content_type = db.Column(db.String(100))
+    size = db.Column(db.Integer, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    duration_ms = db.Column(db.Integer)   # ความยาวเสียง (เฉพาะไฟล์เสียงที่แปลงผ่าน utils/audio.py)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+def is_stored(path):
+    return bool(path) and path.startswith(MEDIA_PREFIX)
+
+
+def disk_path(path):
+    return os.path.join(STATIC_ROOT, path)
+
+
+def legacy_path(value, kind):
+    """ ค่าที่เก็บไว้แบบเดิม → พาธใต้ static/ ('uploads/x', 'images/x', หรือชื่อไฟล์เปล่า) """
+    value = (value or "").lstrip("/")
+    if "/" in value:
+        return value
+    return f"images/{value}" if kind == "image" else f"audio/{value}"
+
+
+def put(data, filename, duration_ms=None):
+    """
+    เก็บไฟล์ (bytes หรือ FileStorage) คืนพาธ 'media/..' สำหรับบันทึกลงคอลัมน์
+    ถ้ามีเนื้อหาเดียวกันอยู่แล้วจะคืนพาธเดิม ไม่เขียนไฟล์ซ้ำ (แถว MediaAsset เพิ่มใน session ปัจจุบัน)
+    ref_count นับให้ตอน commit เมื่อแถวเจ้าของบันทึกพาธนี้แล้ว (ดู _sync_before_commit)
+    """
+    if not isinstance(data, (bytes, bytearray)):
+        data = data.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    asset = db.session.get(MediaAsset, digest)
+    if asset is not None and os.path.exists(disk_path(asset.path)):
+        if duration_ms is not None:
+            asset.duration_ms = duration_ms
+        return asset.path
+
+    ext = os.path.splitext(filename or "")[1].lower()
+    ext = EXT_ALIASES.get(ext, ext)
+    path = f"{MEDIA_PREFIX}{digest[:2]}/{digest}{ext}"
+    target = disk_path(path)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    if asset is None:
+        _insert_asset(sha256=digest, path=path, size=len(data), duration_ms=duration_ms)
+    return path
+
+
+def _insert_asset(**values):
+    """
+    เพิ่มแถว MediaAsset ใน session ปัจจุบันด้วย INSERT ... ON CONFLICT DO NOTHING
+    → แอดมินสองคนอัปโหลดไฟล์เดียวกันพร้อมกันก็ไม่ชน primary key (แถวเดียวกันอยู่แล้ว)
+    """
+    values.setdefault("content_type", mimetypes.guess_type(values["path"])[0] or "application/octet-stream")
+    dialect = db.engine.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        db.session.add(MediaAsset(**values))
+        return
+    db.session.execute(insert(MediaAsset.__table__).values(
+        created_at=datetime.datetime.utcnow(), **values
+    ).on_conflict_do_nothing())
+
+
+def media_columns():
+    """ MEDIA_COLUMNS + คอลัมน์ของตารางเสริมที่อ้างถึงไฟล์ใน store (เสียง TTS) """
+    from utils.tts import TtsClip
+    return MEDIA_COLUMNS + [(TtsClip.path, "audio")]
+
+
+def count_refs(path, session=None):
+    """ จำนวนแถวที่อ้างถึงไฟล์นี้ในทุกคอลัมน์สื่อ """
+    session = session or db.session
+    return sum(
+        session.query(db.func.count()).select_from(column.class_).filter(column == path).scalar() or 0
+        for column, _ in media_columns()
+    )
+
+
+def _remove_files(paths):
+    # ตรวจอีกครั้งด้วย session ใหม่ก่อนลบจริง: ระหว่างรอ commit อาจมีแอดมินอื่นอัปโหลดไฟล์เดียวกันแล้วใช้พาธเดิม
+    with Session(db.engine) as session:
+        paths = [
+            p for p in paths
+            if not count_refs(p, session) and session.query(MediaAsset.sha256).filter_by(path=p).first() is None
+        ]
+    for path in paths:
+        try:
+            os.remove(disk_path(path))
+        except FileNotFoundError:
+            pass
+        # ไฟล์ย่อของรูป (utils/images.py)
+        folder, name = os.path.split(path)
+        shutil.rmtree(os.path.join(STATIC_ROOT, folder, "variants", name), ignore_errors=True)
+
+
+def sync(*paths):
+    """
+    อัปเดต ref_count ของไฟล์ที่เกี่ยวข้องหลังเพิ่ม / แก้ / ลบแถว (เรียกก่อน commit)
+    ไฟล์ที่ไม่มีใครอ้างถึงแล้วจะถูกลบแถว และลบไฟล์จริงหลัง commit สำเร็จ
+    """
+    orphans = []
+    for path in {p for p in paths if is_stored(p)}:
+        asset = MediaAsset.query.filter_by(path=path).first()
+        if asset is None:
+            # แถวถูกลบไปโดย transaction อื่น (ไฟล์เดียวกันเพิ่งถูกใช้ซ้ำ) แต่ยังมีแถวอ้างถึง → สร้างแถวคืน
+            refs = count_refs(path)
+            if refs:
+                _insert_asset(sha256=_digest(path), path=path, size=_size(path), ref_count=refs)
+            continue
+        asset.ref_count = count_refs(path)
+        if asset.ref_count == 0:
+            db.session.delete(asset)
+            orphans.append(path)
+    if orphans:
+        db.event.listen(db.session(), "after_commit", lambda session: _remove_files(orphans), once=True)
+
+
+def _digest(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _size(path):
+    try:
+        return os.path.getsize(disk_path(path))
+    except OSError:
+        return 0
+
+
+def referenced_paths(game_ids=(), lesson_ids=()):
+    """ พาธใน store ที่ข้อของเกม / บทเรียนเหล่านี้อ้างถึง — ส่งให้ track() ก่อนลบเกมหรือบทเรียน (ข้อถูกลบตาม cascade) """
+    paths = set()
+    for column, _ in MEDIA_COLUMNS:
+        model = column.class_
+        conditions = []
+        if game_ids and hasattr(model, "game_id"):
+            conditions.append(model.game_id.in_(list(game_ids)))
+        if lesson_ids and hasattr(model, "lesson_id"):
+            conditions.append(model.lesson_id.in_(list(lesson_ids)))
+        if conditions:
+            rows = db.session.query(column).filter(db.or_(*conditions)).distinct()
+            paths.update(value for (value,) in rows if is_stored(value))
+    return paths
+
+
+# 🔢 ref_count ตามการเปลี่ยนแปลงจริง: จดพาธที่ถูกเพิ่ม / เปลี่ยน / ลบในแต่ละ flush แล้ว sync ก่อน commit
+_PATHS = "media_paths"
+
+
+@db.event.listens_for(Session, "before_flush")
+def _collect_paths(session, flush_context, instances):
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if not changed:
+        return
+    paths = session.info.setdefault(_PATHS, set())
+    for column, _ in media_columns():
+        for obj in changed:
+            if not isinstance(obj, column.class_):
+                continue
+            if obj in session.new or obj in session.deleted:
+                values = [getattr(obj, column.key)]
+            else:
+                history = db.inspect(obj).attrs[column.key].history
+                values = [*history.added, *history.deleted]
+            paths.update(v for v in values if is_stored(v))
+
+
+@db.event.listens_for(Session, "before_commit")
+def _sync_before_commit(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()   # ให้ _collect_paths เห็นการแก้ไขที่ยังค้างอยู่
+    paths = session.info.pop(_PATHS, None)
+    if paths and session is db.session():
+        sync(*paths)
+
+
+@db.event.listens_for(Session, "after_rollback")
+def _clear_paths(session):
+    session.info.pop(_PATHS, None)
+
+
+def track(*paths):
+    """ จดพาธที่ต้อง sync ตอน commit เอง (แถวที่ถูกลบด้วย cascade ในฐานข้อมูล ซึ่ง before_flush ไม่เห็น) """
+    db.session.info.setdefault(_PATHS, set()).update(p for p in paths if is_stored(p))
+
+
+def import_legacy():
+    """
+    ย้ายไฟล์ที่คอลัมน์สื่ออ้างถึงแบบเดิม (uuid / timestamp) เข้า store และแก้ค่าในคอลัมน์
+    ไฟล์ที่เนื้อหาซ้ำกันจะเหลือชุดเดียว ไฟล์ต้นฉบับเดิมไม่ถูกลบ
+    คืน (จำนวนแถวที่แก้, จำนวนไฟล์ที่ไม่พบ)
+    """
+    updated, missing = 0, 0
+    for column, kind in MEDIA_COLUMNS:
+        model = column.class_
+        for row in model.query.filter(column.isnot(None), column != "").all():
+            value = getattr(row, column.key)
+            if is_stored(value):
+                continue
+            source = disk_path(legacy_path(value, kind))
+            if not os.path.isfile(source):
+                missing += 1
+                continue
+            with open(source, "rb") as f:
+                setattr(row, column.key, put(f.read(), source))
+            db.session.flush()
+            updated += 1
+    db.session.commit()
+    gc()
+    return updated, missing
+
+
+def gc(dry_run=False):
+    """ นับการใช้งานใหม่ทั้งหมด ลบแถว + ไฟล์ที่ไม่มีใครใช้ และไฟล์ใน static/media ที่ไม่มีแถว คืนรายการพาธที่ลบ """
+    removed, known = [], set()
+    for asset in MediaAsset.query.all():
+        asset.ref_count = count_refs(asset.path)
+        if asset.ref_count == 0:
+            removed.append(asset.path)
+            if not dry_run:
+                db.session.delete(asset)
+        else:
+            known.add(asset.path)
+
+    cutoff = time.time() - GC_GRACE_S
+    for folder, dirs, files in os.walk(disk_path(MEDIA_PREFIX)):
+        dirs[:] = [d for d in dirs if d != "variants"]
+        for name in files:
+            full = os.path.join(folder, name)
+            path = os.path.relpath(full, STATIC_ROOT).replace(os.sep, "/")
+            if path not in known and path not in removed and os.path.getmtime(full) < cutoff:
+                removed.append(path)
+
+    if dry_run:
+        db.session.rollback()
+        return removed
+    db.session.commit()
+    _remove_files(removed)
+    return removed
@@ -0,0 +1,229 @@
+import datetime
+from models import (
+    db, Game, GameScore, QuizResult, Exercise, SpeechResult,
+    GameItem, ChoiceItem, ScrambleItem, FillInBlank, MatchingItem, SpeechQuestion
+)
+
+
+class SchemaMigration(db.Model):
+    """ บันทึกว่า migration ไหนรันไปแล้ว (แทน Alembic — โปรเจกต์ไม่มีเครื่องมือ migration) """
+    __tablename__ = "schema_migrations"
+
+    id = db.Column(db.String(64), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+# 🔎 index ที่เส้นทางหลักต้องใช้ (ผูกกับคอลัมน์ของโมเดล)
+# db.create_all() สร้างให้ด้วยเฉพาะเมื่อโมดูลนี้ถูก import ก่อน — routes/__init__.py import ไว้แล้ว
+# ฐานข้อมูลเดิม / สร้างตารางก่อน import routes: python manage.py migrate แล้วตรวจด้วย check-indexes
+HOT_PATH_INDEXES = [
+    # คะแนนเกมของผู้ใช้ (user_id, game_id) อยู่ใน UNIQUE_INDEXES ด้านล่าง
+    db.Index("ix_game_score_game", GameScore.game_id),
+    # pre/post test
+    db.Index("ix_quiz_result_user_lesson_type", QuizResult.user_id, QuizResult.lesson_id, QuizResult.test_type),
+    # คำถามของบทเรียน (ควิซในเกม / แบบทดสอบ)
+    db.Index("ix_exercise_lesson_type_lang", Exercise.lesson_id, Exercise.question_type, Exercise.lang),
+    db.Index("ix_speech_result_user_question", SpeechResult.user_id, SpeechResult.question_id),
+    db.Index("ix_game_lesson", Game.lesson_id),
+    # ข้อของแต่ละเกม
+    db.Index("ix_game_item_game", GameItem.game_id),
+    db.Index("ix_choice_item_game", ChoiceItem.game_id),
+    db.Index("ix_scramble_item_game", ScrambleItem.game_id),
+    db.Index("ix_fill_in_blank_game", FillInBlank.game_id),
+    db.Index("ix_matching_item_game", MatchingItem.game_id),
+    db.Index("ix_speech_question_game", SpeechQuestion.game_id),
+]
+
+# 🔒 unique index (ต้องล้างข้อมูลซ้ำก่อนสร้าง) — save_game_score ใช้เป็นเป้าของ ON CONFLICT
+UNIQUE_INDEXES = [
+    db.Index("uq_game_score_user_game", GameScore.user_id, GameScore.game_id, unique=True),
+]
+
+
+def _create_table(model):
+    def run():
+        model.__table__.create(db.engine, checkfirst=True)
+    return run
+
+
+def _create_indexes(indexes):
+    def run():
+        # สร้างเฉพาะที่ยังไม่มี index เทียบเท่า (อาจมีอยู่แล้วในชื่ออื่นจาก index=True ของโมเดล)
+        wanted = {i.name for i in indexes}
+        by_name = {i.name: i for i in HOT_PATH_INDEXES + UNIQUE_INDEXES}
+        for _, name, _ in missing_indexes():
+            if name in wanted:
+                by_name[name].create(db.engine, checkfirst=True)
+    return run
+
+
+def _leaderboard_table():
+    from utils.leaderboard import LeaderboardTotal, rebuild
+    _create_table(LeaderboardTotal)()
+    rebuild()
+
+
+def _item_count_table():
+    from utils.item_index import GameItemCount, rebuild
+    _create_table(GameItemCount)()
+    rebuild()
+
+
+def _dedupe_game_scores():
+    """ เหลือแถวเดียวต่อ (user_id, game_id): เก็บคะแนนสูงสุด (เสมอกันเก็บแถวแรก) แล้วสร้าง unique index """
+    dupes = (
+        db.session.query(GameScore.user_id, GameScore.game_id)
+        .group_by(GameScore.user_id, GameScore.game_id)
+        .having(db.func.count(GameScore.id) > 1)
+        .all()
+    )
+    for user_id, game_id in dupes:
+        rows = (
+            GameScore.query.filter_by(user_id=user_id, game_id=game_id)
+            .order_by(GameScore.score.desc(), GameScore.id)
+            .all()
+        )
+        for row in rows[1:]:
+            db.session.delete(row)
+    db.session.commit()
+
+    # index ธรรมดาของ 0003 (ถ้ามี) ซ้ำซ้อนกับ unique index แล้ว
+    db.session.execute(db.text("DROP INDEX IF EXISTS ix_game_score_user_game"))
+    db.session.commit()
+    _create_indexes(UNIQUE_INDEXES)()
+
+
+def _content_version_table():
+    from utils.content_cache import ContentVersion
+    _create_table(ContentVersion)()
+    if db.session.get(ContentVersion, 1) is None:
+        db.session.add(ContentVersion(id=1, version=0))
+        db.session.commit()
+
+
+def _media_asset_table():
+    from utils.media_store import MediaAsset
+    _create_table(MediaAsset)()
+
+
+def _media_asset_duration():
+    """ คอลัมน์ duration_ms ของ media_asset (ฐานข้อมูลที่สร้างจาก 0007 ก่อนมีคอลัมน์นี้) """
+    columns = {c["name"] for c in db.inspect(db.engine).get_columns("media_asset")}
+    if "duration_ms" not in columns:
+        db.session.execute(db.text("ALTER TABLE media_asset ADD COLUMN duration_ms INTEGER"))
+        db.session.commit()
+
+
+def _tts_clip_table():
+    from utils.tts import TtsClip
+    _create_table(TtsClip)()
+
+
+def _speech_job_table():
+    from utils.speech_jobs import SpeechJob
+    _create_table(SpeechJob)()
+
+
+def _leaderboard_drop_scope_columns():
+    """ ลบคอลัมน์ school / classroom ที่คัดลอกจาก User (ไม่มีใครอ่าน และค้างค่าเก่าเมื่อนักเรียนย้ายห้อง) """
+    columns = {c["name"] for c in db.inspect(db.engine).get_columns("leaderboard_total")}
+    db.session.execute(db.text("DROP INDEX IF EXISTS ix_leaderboard_scope"))
+    db.session.execute(db.text("DROP INDEX IF EXISTS ix_leaderboard_room"))
+    for column in ("school", "classroom"):
+        if column in columns:
+            db.session.execute(db.text(f"ALTER TABLE leaderboard_total DROP COLUMN {column}"))
+    db.session.commit()
+
+
+def _canonical_quiz_keys():
+    """
+    แปลง lang / question_type / test_type ที่บันทึกไว้แล้วให้เป็นค่ามาตรฐาน (utils/canonical.py)
+    lang ที่ไม่รู้จักจะไม่ถูกแก้ — พิมพ์รายการแถวไว้ให้แอดมินแก้เอง
+    """
+    from utils.canonical import lang_code, canonical_test_type
+    unmapped = []
+
+    def fix_lang(row, label):
+        code = lang_code(row.lang) if (row.lang or "").strip() else "en"   # ว่าง = ภาษาอังกฤษ (ค่าเริ่มต้นของแอป)
+        if code is None:
+            unmapped.append(f"{label} id={row.id} lang={row.lang!r}")
+        elif code != row.lang:
+            row.lang = code
+
+    for ex in Exercise.query.all():
+        fix_lang(ex, "exercise")
+        qtype = canonical_test_type(ex.question_type)
+        if ex.question_type != qtype:
+            ex.question_type = qtype
+    for game in Game.query.all():
+        fix_lang(game, "game")
+    for result in QuizResult.query.all():
+        if result.test_type != canonical_test_type(result.test_type):
+            result.test_type = canonical_test_type(result.test_type)
+    db.session.commit()
+    for line in unmapped:
+        print(f"⚠️ ไม่รู้จักภาษา (ไม่ได้แก้): {line}")
+
+
+# (id, รายละเอียด, ฟังก์ชัน) — เพิ่มต่อท้ายเท่านั้น ห้ามแก้ลำดับของที่รันไปแล้ว
+MIGRATIONS = [
+    ("0001_leaderboard_total", "ตารางคะแนนรวม leaderboard_total", _leaderboard_table),
+    ("0002_game_item_count", "ดัชนีจำนวนข้อ game_item_count", _item_count_table),
+    ("0003_hot_path_indexes", "composite index ของเส้นทางหลัก", _create_indexes(HOT_PATH_INDEXES)),
+    ("0004_game_score_unique", "ล้างคะแนนซ้ำ + unique (user_id, game_id)", _dedupe_game_scores),
+    ("0005_canonical_quiz_keys", "ค่ามาตรฐานของภาษา / ประเภทคำถาม", _canonical_quiz_keys),
+    ("0006_content_version", "ตัวนับเวอร์ชันของ cache เนื้อหา", _content_version_table),
+    ("0007_media_asset", "ตาราง media_asset ของ media store", _media_asset_table),
+    ("0008_media_asset_duration", "ความยาวเสียงใน media_asset", _media_asset_duration),
+    ("0009_tts_clip", "ตาราง tts_clip ของเสียงอ่านที่สร้างไว้ล่วงหน้า", _tts_clip_table),
+    ("0010_speech_job", "ตาราง speech_job ของงานตรวจเสียงแบบ async (ใช้ร่วมกันทุก worker)", _speech_job_table),
+    ("0011_leaderboard_drop_scope", "ลบคอลัมน์ school / classroom ของ leaderboard_total", _leaderboard_drop_scope_columns),
+]
+
+
+def applied():
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    return {m.id for m in SchemaMigration.query.all()}
+
+
+def pending():
+    done = applied()
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def upgrade():
+    """ รัน migration ที่ยังไม่ได้รันตามลำดับ คืนรายการ id ที่รัน """
+    ran = []
+    for migration_id, _, run in pending():
+        run()
+        db.session.add(SchemaMigration(id=migration_id))
+        db.session.commit()
+        ran.append(migration_id)
+    return ran
+
+
+def missing_indexes():
+    """
+    เทียบ HOT_PATH_INDEXES + UNIQUE_INDEXES กับ index จริงในฐานข้อมูล
+    index ธรรมดา: มีแล้วถ้ามี index / unique / primary key ใดขึ้นต้นด้วยคอลัมน์ชุดเดียวกัน
+    unique: ต้องมี unique index / constraint ที่คอลัมน์ตรงกันพอดี
+    คืน [(ตาราง, ชื่อ index, [คอลัมน์])]
+    """
+    inspector = db.inspect(db.engine)
+    existing = {}
+    missing = []
+    for index in HOT_PATH_INDEXES + UNIQUE_INDEXES:
+        table = index.table.name
+        if table not in existing:
+            indexes = [(i["column_names"], bool(i["unique"])) for i in inspector.get_indexes(table)]
+            indexes += [(u["column_names"], True) for u in inspector.get_unique_constraints(table)]
+            indexes.append((inspector.get_pk_constraint(table)["constrained_columns"], True))
+            existing[table] = indexes
+        wanted = [c.name for c in index.columns]
+        if index.unique:
+            found = any(unique and cols == wanted for cols, unique in existing[table])
+        else:
+            found = any(cols[:len(wanted)] == wanted for cols, _ in existing[table])
+        if not found:
+            missing.append((table, index.name, wanted))
+    return missing
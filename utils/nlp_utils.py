@@ -1,17 +1,178 @@
-import whisper
-from sentence_transformers import SentenceTransformer, util
-import torch
+import hashlib, threading
+from config import Config
+from utils.cache import TTLCache
 
-# โหลดโมเดลครั้งเดียวตอนเริ่มระบบ
-whisper_model = whisper.load_model("base")
-embedder = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# โมเดลโหลดแบบ lazy ครั้งเดียวต่อ process
+# ถ้าตั้ง INFERENCE_URL ไว้ จะเรียก inference_server.py แทน (web worker ไม่ต้องโหลดโมเดลเลย)
+_embedders = {}
+_batcher = None
+_reference_cache = None
+_load_lock = threading.Lock()
 
-def transcribe_audio(filepath, lang="en"):
-    result = whisper_model.transcribe(filepath, fp16=False, language=lang)
-    return result["text"].strip()
+# cache ผลถอดเสียง (key = hash ของ PCM + ภาษา + backend/โมเดล) และ similarity กับคำตอบอ้างอิง
+transcript_cache = TTLCache(Config.TRANSCRIPT_CACHE_SIZE, Config.TRANSCRIPT_CACHE_TTL)
+similarity_cache = TTLCache(Config.TRANSCRIPT_CACHE_SIZE, Config.TRANSCRIPT_CACHE_TTL)
 
-def compare_similarity(text1, text2, lang="en"):
+
+def _client():
+    if not Config.INFERENCE_URL:
+        return None
+    from utils.inference_client import InferenceClient
+    return InferenceClient(Config.INFERENCE_URL, timeout=Config.INFERENCE_TIMEOUT)
+
+
+def get_asr(lang="en"):
+    """ ASR backend ตาม config (ASR_BACKEND + ขนาดโมเดลแยกตามภาษา) """
+    size = Config.ASR_MODEL_ZH if lang == "zh" else Config.ASR_MODEL_EN
+    from utils.asr import get_backend
+    return get_backend(Config.ASR_BACKEND, size, compute_type=Config.ASR_COMPUTE_TYPE)
+
+
+def get_embedder(name=None):
+    name = name or Config.EMBED_MODEL
+    with _load_lock:
+        if name not in _embedders:
+            from sentence_transformers import SentenceTransformer
+            _embedders[name] = SentenceTransformer(name)
+        return _embedders[name]
+
+
+def transcribe_audio(audio, lang="en"):
+    """ audio เป็นได้ทั้ง path, bytes ของไฟล์เสียง หรือ float32 array 16 kHz """
+    client = _client()
+    if client:
+        if isinstance(audio, str):
+            with open(audio, "rb") as f:
+                audio = f.read()
+        return client.transcribe(audio, lang=lang)
+    return local_transcribe(audio, lang)
+
+
+def get_batcher():
+    """ micro-batcher หน้า ASR backend (ใช้เมื่อ ASR_BATCH_SIZE > 1) """
+    global _batcher
+    with _load_lock:
+        if _batcher is None:
+            from utils.asr_batcher import TranscriptionBatcher
+            _batcher = TranscriptionBatcher(
+                lambda audios, lang: get_asr(lang).transcribe_batch(audios, lang),
+                max_batch=Config.ASR_BATCH_SIZE,
+                max_wait_ms=Config.ASR_BATCH_WAIT_MS,
+            )
+        return _batcher
+
+
+def local_transcribe(audio, lang="en"):
+    from utils.audio import load_audio, SAMPLE_RATE
+    audio = load_audio(audio)
+    if Config.VAD_ENABLED:
+        from utils.vad import trim_silence
+        audio = trim_silence(audio, SAMPLE_RATE, max_speech_s=Config.VAD_MAX_SPEECH_S)
+        if audio is None:
+            return ""  # ไม่มีเสียงพูด ไม่ต้องรันโมเดล
+    asr = get_asr(lang)
+    key = _audio_fingerprint(audio, lang, asr)
+    text = transcript_cache.get(key)
+    if text is not None:
+        return text
+
+    if Config.ASR_BATCH_SIZE > 1:
+        text = get_batcher().transcribe(audio, lang)
+    elif asr.thread_safe:
+        text = asr.transcribe(audio, lang)
+    else:
+        # openai-whisper ไม่ thread-safe → ทำทีละคลิป
+        with asr.lock:
+            text = asr.transcribe(audio, lang)
+    transcript_cache.set(key, text)
+    return text
+
+
+def _audio_fingerprint(audio, lang, asr):
+    """ hash ของ PCM 16-bit (หลังตัดเงียบ) + ภาษา + backend/โมเดล """
+    import numpy as np
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+    h = hashlib.sha256(pcm)
+    h.update(f"|{lang}|{asr.name}|{asr.model_size}".encode())
+    return h.hexdigest()
+
+
+def compare_similarity(text1, text2, lang="en", model=None):
+    client = _client()
+    if client:
+        return client.similarity(text1, text2, model=model or Config.EMBED_MODEL)
+    return local_similarity(text1, text2, model)
+
+
+def local_similarity(text1, text2, model=None):
+    from sentence_transformers import util
+    embedder = get_embedder(model)
     emb1 = embedder.encode(text1.lower().strip(), convert_to_tensor=True)
     emb2 = embedder.encode(text2.lower().strip(), convert_to_tensor=True)
     score = util.cos_sim(emb1, emb2).item()
     return score
+
+
+def _normalize(text):
+    return (text or "").lower().strip()
+
+
+def get_reference_cache():
+    global _reference_cache
+    with _load_lock:
+        if _reference_cache is None:
+            from utils.embedding_cache import EmbeddingCache
+            _reference_cache = EmbeddingCache(Config.EMBED_CACHE_DIR)
+        return _reference_cache
+
+
+def reference_similarity(transcript, reference, model=None):
+    """ เทียบคำพูดกับคำตอบอ้างอิง โดยใช้เวกเตอร์อ้างอิงจาก cache (encode แค่ transcript) """
+    model = model or Config.EMBED_MODEL
+    client = _client()
+    if client:
+        return client.reference_similarity(transcript, reference, model=model)
+    return local_reference_similarity(transcript, reference, model)
+
+
+def local_reference_similarity(transcript, reference, model=None):
+    model = model or Config.EMBED_MODEL
+    key = (model, _normalize(transcript), _normalize(reference))
+    score = similarity_cache.get(key)
+    if score is None:
+        score = _reference_similarity(transcript, reference, model)
+        similarity_cache.set(key, score)
+    return score
+
+
+def _reference_similarity(transcript, reference, model):
+    import numpy as np
+    embedder = get_embedder(model)
+    ref = get_reference_cache().get(
+        _normalize(reference), model, lambda t: embedder.encode(t, normalize_embeddings=True)
+    )
+    vec = embedder.encode(_normalize(transcript), normalize_embeddings=True)
+    return float(np.dot(vec, ref))
+
+
+def warm_reference(text, model=None):
+    """ คำนวณเวกเตอร์คำตอบอ้างอิงล่วงหน้า (เรียกตอนแอดมินบันทึกคำถาม) """
+    model = model or Config.EMBED_MODEL
+    client = _client()
+    if client:
+        return client.reference(text, model=model, action="warm")
+    embedder = get_embedder(model)
+    get_reference_cache().get(_normalize(text), model, lambda t: embedder.encode(t, normalize_embeddings=True))
+
+
+def invalidate_reference(text, model=None):
+    """ ลบเวกเตอร์ของคำตอบเดิม (เรียกตอนแก้ไข/ลบคำถาม) """
+    model = model or Config.EMBED_MODEL
+    client = _client()
+    if client:
+        return client.reference(text, model=model, action="drop")
+    get_reference_cache().invalidate(_normalize(text), model)
+
+
+def cache_stats():
+    return {"transcript": transcript_cache.stats(), "similarity": similarity_cache.stats()}
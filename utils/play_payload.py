@@ -0,0 +1,87 @@
+from models import MatchingItem, GameItem, FillInBlank, ScrambleItem, ChoiceItem, SpeechQuestion
+from utils import content_cache, tts
+
+# ข้อมูลสำหรับเล่นเกมที่คำนวณไว้ล่วงหน้า (แยกคำตอบ, pinyin, ตัวเลือก, คำเรียง)
+# cache ตามเวอร์ชันเนื้อหา → คำนวณใหม่เมื่อแอดมินแก้ข้อเท่านั้น แต่ละ request แค่สุ่มลำดับเอง
+# ห้ามแก้ค่าใน payload โดยตรง (ใช้ร่วมกันทุก request) ให้สร้างสำเนาก่อนสับ
+
+
+def _split(value):
+    return [w.strip() for w in (value or "").split(";")]
+
+
+def _matching(game):
+    items = content_cache.get_items(MatchingItem, game.id)
+    # เสียงอ่านข้อความคำตอบ ใช้แทนเมื่อข้อไม่มีไฟล์เสียงที่อัปโหลด
+    return {"items": items, "tts": tts.clip_paths([i.answer_text for i in items], game.lang)}
+
+
+def _drag(game):
+    items = content_cache.get_items(GameItem, game.id)
+    return {
+        "items": items,
+        "words": [i.correct_word for i in items],
+        "pinyin_map": {i.correct_word: i.pinyin or "" for i in items},
+        "tts": tts.clip_paths([i.correct_word for i in items], game.lang),
+    }
+
+
+def _fill(game):
+    items = content_cache.get_items(FillInBlank, game.id)
+    hint_words = set()
+    for it in items:
+        if it.correct_word:
+            hint_words.update(_split(it.correct_word))
+    return {
+        "items": items,
+        "hint_words": list(hint_words),
+        "answers": {it.id: [w.lower() for w in _split(it.correct_word)] for it in items},
+    }
+
+
+def _scramble(game):
+    items = content_cache.get_items(ScrambleItem, game.id)
+    return {"items": items, "words": {it.id: list(it.words) for it in items}}
+
+
+def _choice(game):
+    items = content_cache.get_items(ChoiceItem, game.id)
+    return {
+        "items": items,
+        "options": {it.id: it.options.split(";") if it.options else [] for it in items},
+    }
+
+
+def _quiz(game):
+    items = content_cache.get_quiz_questions(game.lesson_id, game.lang)
+    return {
+        "items": items,
+        "answers": {it.id: (it.correct_option or "").strip().upper() for it in items},
+    }
+
+
+def _speech(game):
+    questions = content_cache.get_items(SpeechQuestion, game.id)
+    pinyin_map = {}
+    if (game.lang or "en") == "zh":
+        pinyin_map = {
+            q.correct_answer: getattr(q, "pinyin", "") or getattr(q, "pinyin_text", "") or ""
+            for q in questions
+        }
+    return {"questions": questions, "pinyin_map": pinyin_map}
+
+
+COMPILERS = {
+    "matching": _matching,
+    "drag": _drag,
+    "fill": _fill,
+    "scramble": _scramble,
+    "choice": _choice,
+    "quiz": _quiz,
+    "speech": _speech,
+}
+
+
+def get_payload(game, kind):
+    """ payload ของเกมตามชนิด (matching / drag / fill / scramble / choice / quiz / speech) """
+    return content_cache.derived(f"payload:{kind}:{game.id}", lambda: COMPILERS[kind](game))
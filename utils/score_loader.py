@@ -0,0 +1,136 @@
+from models import (
+    db, Lesson, Game, GameScore, QuizResult, Exercise, GameItem, ChoiceItem,
+    ScrambleItem, FillInBlank, MatchingItem, SpeechQuestion
+)
+
+# ประเภทเกม → ตารางข้อของเกมนั้น (ใช้หาคะแนนเต็ม)
+ITEM_MODELS = {
+    "choice": ChoiceItem, "choice_match": ChoiceItem,
+    "scramble": ScrambleItem,
+    "fill": FillInBlank, "fill-in-the-blank": FillInBlank,
+    "matching": MatchingItem,
+    "drag": GameItem, "drag drop": GameItem,
+    "speech": SpeechQuestion,
+}
+QUIZ_TYPES = ["quiz", "exam", "test"]
+DEFAULT_MAX = 10  # fallback เดิมของหน้าคะแนน
+
+
+def best_score_by_lesson(user_id, lesson_ids):
+    """ คะแนนสูงสุดของผู้ใช้ในแต่ละบทเรียน — query เดียว """
+    if not lesson_ids:
+        return {}
+    rows = (
+        db.session.query(Game.lesson_id, db.func.max(GameScore.score))
+        .join(Game, Game.id == GameScore.game_id)
+        .filter(GameScore.user_id == user_id, Game.lesson_id.in_(lesson_ids))
+        .group_by(Game.lesson_id)
+        .all()
+    )
+    return {lesson_id: score or 0 for lesson_id, score in rows}
+
+
+def latest_score_by_game(user_id, game_ids):
+    """ คะแนนล่าสุด (ตาม played_at) ของผู้ใช้ในแต่ละเกม — query เดียว """
+    if not game_ids:
+        return {}
+    rows = (
+        db.session.query(GameScore.game_id, GameScore.score)
+        .filter(GameScore.user_id == user_id, GameScore.game_id.in_(game_ids))
+        .order_by(GameScore.played_at.desc())
+        .all()
+    )
+    latest = {}
+    for game_id, score in rows:
+        latest.setdefault(game_id, score)
+    return latest
+
+
+def unit_overview(user_id, lesson_id):
+    """
+    บทเรียน + เกมทั้งหมดในบท + สถานะที่ผู้ใช้เล่นแล้ว/ทำ pre-post แล้ว ใน query เดียว
+    คืน (lesson, [(game, played)], pre_done, post_done) หรือ None ถ้าไม่มีบทเรียนนี้
+    """
+    played = db.exists().where(GameScore.user_id == user_id, GameScore.game_id == Game.id)
+    quiz_done = lambda test_type: db.exists().where(
+        QuizResult.user_id == user_id,
+        QuizResult.lesson_id == Lesson.id,
+        QuizResult.test_type == test_type,
+    )
+    rows = (
+        db.session.query(
+            Lesson, Game, played.label("played"),
+            quiz_done("pre").label("pre_done"), quiz_done("post").label("post_done"),
+        )
+        .outerjoin(Game, Game.lesson_id == Lesson.id)
+        .filter(Lesson.id == lesson_id)
+        .order_by(Game.id)
+        .all()
+    )
+    if not rows:
+        return None
+    lesson, _, _, pre_done, post_done = rows[0]
+    games = [(game, bool(p)) for _, game, p, _, _ in rows if game is not None]
+    return lesson, games, bool(pre_done), bool(post_done)
+
+
+def quiz_scores_by_lesson(user_id, lesson_ids):
+    """ คะแนน pre/post ของแต่ละบทเรียน — query เดียว: {lesson_id: {"pre": x, "post": y}} """
+    if not lesson_ids:
+        return {}
+    rows = (
+        QuizResult.query
+        .filter(QuizResult.user_id == user_id, QuizResult.lesson_id.in_(lesson_ids))
+        .order_by(QuizResult.id)
+        .all()
+    )
+    result = {}
+    for r in rows:
+        result.setdefault(r.lesson_id, {}).setdefault(r.test_type, r.score)
+    return result
+
+
+def item_counts(games):
+    """
+    จำนวนข้อ (คะแนนเต็ม) ของแต่ละเกม: GROUP BY ต่อหนึ่งตารางข้อ
+    จำนวน query คงที่ (ไม่เกินจำนวนประเภทตาราง) ไม่ขึ้นกับจำนวนเกม
+    """
+    counts = {}
+    by_model = {}
+    quiz_games = []
+    for g in games:
+        gtype = (g.game_type or "").strip().lower()
+        if gtype in QUIZ_TYPES:
+            quiz_games.append(g)
+        elif gtype in ITEM_MODELS:
+            by_model.setdefault(ITEM_MODELS[gtype], []).append(g.id)
+        else:
+            counts[g.id] = DEFAULT_MAX
+
+    for model, game_ids in by_model.items():
+        rows = (
+            db.session.query(model.game_id, db.func.count(model.id))
+            .filter(model.game_id.in_(game_ids))
+            .group_by(model.game_id)
+            .all()
+        )
+        found = dict(rows)
+        for game_id in game_ids:
+            counts[game_id] = found.get(game_id, 0)
+
+    if quiz_games:
+        # ควิซในเกมใช้คำถาม Exercise ของบทเรียน (question_type="game") ตามภาษา
+        rows = (
+            db.session.query(Exercise.lesson_id, Exercise.lang, db.func.count(Exercise.id))
+            .filter(
+                Exercise.question_type == "game",
+                Exercise.lesson_id.in_({g.lesson_id for g in quiz_games}),
+            )
+            .group_by(Exercise.lesson_id, Exercise.lang)
+            .all()
+        )
+        found = {(lesson_id, lang): n for lesson_id, lang, n in rows}
+        for g in quiz_games:
+            counts[g.id] = found.get((g.lesson_id, g.lang), 0)
+
+    return counts
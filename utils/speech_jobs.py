@@ -0,0 +1,173 @@
+import json, threading, time, uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from models import db
+
+
+class QueueFull(Exception):
+    """ คิวงานตรวจเสียงเต็ม (ให้ client ลองใหม่ภายหลัง) """
+
+
+class SpeechJob(db.Model):
+    """ สถานะงานตรวจเสียง เก็บในฐานข้อมูลให้ทุก worker ตอบการ poll ได้ (ไม่ขึ้นกับว่า worker ไหนรับไฟล์) """
+    __tablename__ = "speech_job"
+
+    id = db.Column(db.String(32), primary_key=True)
+    owner = db.Column(db.Integer, index=True)
+    status = db.Column(db.String(10), nullable=False, default="queued")   # queued / running / done / failed
+    result = db.Column(db.Text)   # JSON
+    error = db.Column(db.Text)
+    queued_at = db.Column(db.Float, nullable=False)
+    started_at = db.Column(db.Float)
+    finished_at = db.Column(db.Float)
+
+
+class SpeechJobQueue:
+    """
+    คิวงานถอดเสียง/ให้คะแนนแบบ background
+    - แต่ละ process มี thread pool ของตัวเอง จำกัดจำนวน worker และความยาวคิว (งานที่รอ + กำลังทำ)
+    - สถานะ / ผลของงานเก็บในตาราง speech_job → poll ที่ worker ไหนก็ได้ เก็บไว้ result_ttl วินาที
+    - เก็บสถิติ queue depth / wait time / latency ของ process นี้สำหรับปรับขนาด pool
+    """
+
+    def __init__(self, app, workers=2, max_queue=64, result_ttl=300, history=500):
+        self.app = app
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speech-job")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._waits = deque(maxlen=history)
+        self._latencies = deque(maxlen=history)
+
+    def _write(self, job_id, **fields):
+        # session แยกสั้น ๆ ไม่ปนกับ session ของ request / งานที่กำลังรัน
+        with Session(db.engine) as session:
+            session.query(SpeechJob).filter_by(id=job_id).update(fields)
+            session.commit()
+
+    def submit(self, fn, *args, owner=None, **kwargs):
+        with self._lock:
+            if self._pending + self._running >= self.max_queue:
+                self._counts["rejected"] += 1
+                raise QueueFull()
+            self._pending += 1
+            self._counts["submitted"] += 1
+
+        job_id = uuid.uuid4().hex
+        queued_at = time.time()
+        try:
+            with Session(db.engine) as session:
+                self._expire(session)
+                session.add(SpeechJob(id=job_id, owner=owner, status="queued", queued_at=queued_at))
+                session.commit()
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+        self._pool.submit(self._run, job_id, queued_at, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, queued_at, fn, args, kwargs):
+        # thread ของ pool ไม่มี app context ของ request → เปิดใหม่เอง
+        with self.app.app_context():
+            started_at = time.time()
+            with self._lock:
+                self._pending -= 1
+                self._running += 1
+                self._waits.append(started_at - queued_at)
+
+            result, error = None, None
+            try:
+                self._write(job_id, status="running", started_at=started_at)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = str(e)
+            finally:
+                db.session.remove()
+
+            finished_at = time.time()
+            try:
+                self._write(
+                    job_id, status="failed" if error else "done", finished_at=finished_at,
+                    result=None if error else json.dumps(result, ensure_ascii=False), error=error,
+                )
+            except Exception as e:
+                print("⚠️ speech job status write failed:", job_id, e)
+
+            with self._lock:
+                self._running -= 1
+                self._counts["failed" if error else "completed"] += 1
+                self._latencies.append(finished_at - started_at)
+
+    def get(self, job_id):
+        with Session(db.engine) as session:
+            job = session.get(SpeechJob, job_id)
+            if job is None:
+                return None
+            data = {c.name: getattr(job, c.name) for c in SpeechJob.__table__.columns}
+        data["result"] = json.loads(data["result"]) if data["result"] else None
+        return data
+
+    def _expire(self, session):
+        # ลบงานที่เสร็จแล้วและเกินเวลาเก็บ / งานค้าง (worker ตายระหว่างทำ) ที่เก่ากว่า 2 เท่าของเวลาเก็บ
+        now = time.time()
+        session.query(SpeechJob).filter(
+            db.or_(
+                SpeechJob.finished_at < now - self.result_ttl,
+                SpeechJob.queued_at < now - 2 * self.result_ttl,
+            )
+        ).delete(synchronize_session=False)
+
+    def stats(self):
+        with Session(db.engine) as session:
+            shared = dict(
+                session.query(SpeechJob.status, db.func.count()).group_by(SpeechJob.status).all()
+            )
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._pending,
+                "running": self._running,
+                **self._counts,
+                "all_workers": {s: shared.get(s, 0) for s in ("queued", "running", "done", "failed")},
+                "wait_ms": _summary(self._waits),
+                "latency_ms": _summary(self._latencies),
+            }
+
+
+def _summary(samples):
+    """ สรุป avg/p50/p95/max (มิลลิวินาที) จากตัวอย่างล่าสุด """
+    if not samples:
+        return {"avg": 0, "p50": 0, "p95": 0, "max": 0}
+    data = sorted(s * 1000 for s in samples)
+    pick = lambda p: data[min(len(data) - 1, int(p * len(data)))]
+    return {
+        "avg": round(sum(data) / len(data), 1),
+        "p50": round(pick(0.50), 1),
+        "p95": round(pick(0.95), 1),
+        "max": round(data[-1], 1),
+    }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_speech_queue(app):
+    """ คืนคิวเดียวต่อ process (สร้างครั้งแรกตามค่าใน app.config) """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = SpeechJobQueue(
+                app,
+                workers=int(app.config.get("SPEECH_WORKERS", 2)),
+                max_queue=int(app.config.get("SPEECH_QUEUE_SIZE", 64)),
+                result_ttl=int(app.config.get("SPEECH_RESULT_TTL", 300)),
+            )
+        return _queue
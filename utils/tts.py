@@ -0,0 +1,161 @@
+import datetime, hashlib, subprocess
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from config import Config
+from models import db, Game, GameItem, MatchingItem
+from utils import media_store
+from utils.audio import AudioDecodeError, transcode_for_playback
+
+# 🗣️ เสียงอ่านคำศัพท์ที่สร้างฝั่งเซิร์ฟเวอร์ (espeak-ng ทำงานออฟไลน์ในเครื่อง)
+# สร้างตอนแอดมินบันทึกข้อ → เก็บใน media store → หน้าเกมเล่นเป็นไฟล์เสียงที่ cache ได้
+# ไม่ต้องรอ speechSynthesis.getVoices() ของเบราว์เซอร์ (และไม่ขึ้นกับว่าเครื่องมีเสียงภาษาจีนหรือไม่)
+# ข้อความเดียวกัน + เสียงเดียวกันสร้างครั้งเดียว ใช้ร่วมกันทุกเกม
+# request ของแอดมินแค่นัดงาน (schedule) — espeak-ng / ffmpeg รันใน thread แยกหลัง commit
+
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+
+
+class TtsClip(db.Model):
+    __tablename__ = "tts_clip"
+
+    key = db.Column(db.String(64), primary_key=True)   # sha256 ของ เสียง|ความเร็ว|ข้อความ
+    lang = db.Column(db.String(10), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    path = db.Column(db.String(255), nullable=False)   # media/..
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+def _voice(lang):
+    return Config.TTS_VOICE_ZH if lang == "zh" else Config.TTS_VOICE_EN
+
+
+def clip_key(text, lang):
+    return hashlib.sha256(f"{_voice(lang)}|{Config.TTS_SPEED}|{text}".encode("utf-8")).hexdigest()
+
+
+def synthesize(text, lang):
+    """ espeak-ng → WAV bytes """
+    cmd = [Config.TTS_ENGINE, "-v", _voice(lang), "-s", str(Config.TTS_SPEED), "--stdout", text]
+    try:
+        return subprocess.run(cmd, capture_output=True, check=True, timeout=Config.TTS_TIMEOUT).stdout
+    except FileNotFoundError:
+        raise AudioDecodeError(f"ไม่พบ {Config.TTS_ENGINE} ในเครื่อง")
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        raise AudioDecodeError(str(e))
+
+
+def prerender(text, lang):
+    """
+    สร้างเสียงของข้อความ (ถ้ายังไม่มี) แล้วเพิ่มแถวใน session ปัจจุบัน — ผู้เรียก commit เอง
+    คืนพาธใน media store หรือ None ถ้าสร้างไม่ได้ (หน้าเกมจะใช้ speechSynthesis แทน)
+    """
+    text, lang = (text or "").strip(), lang or "en"
+    if not text:
+        return None
+    key = clip_key(text, lang)
+    clip = db.session.get(TtsClip, key)
+    if clip is not None:
+        return clip.path
+    try:
+        encoded, ext, duration_ms = transcode_for_playback(
+            synthesize(text, lang), Config.AUDIO_FORMAT, timeout=Config.TTS_TIMEOUT
+        )
+    except AudioDecodeError as e:
+        print("⚠️ tts failed:", text, e)
+        return None
+    path = media_store.put(encoded, "tts" + ext, duration_ms=duration_ms)
+    db.session.add(TtsClip(key=key, lang=lang, text=text, path=path))
+    return path
+
+
+def _render(app, text, lang):
+    with app.app_context():
+        try:
+            if prerender(text, lang):
+                db.session.commit()
+        except Exception as e:  # เช่น อีก worker สร้างข้อความเดียวกันไปก่อน (ชน primary key)
+            db.session.rollback()
+            print("⚠️ tts failed:", text, e)
+        finally:
+            db.session.remove()
+
+
+def schedule(text, lang):
+    """ นัดสร้างเสียงของข้อความหลัง commit ของ request สำเร็จ (ไม่หน่วง request / ไม่สร้างถ้า rollback) """
+    text = (text or "").strip()
+    if not text:
+        return
+    app = current_app._get_current_object()
+    db.event.listen(
+        db.session(), "after_commit",
+        lambda session: _pool.submit(_render, app, text, lang or "en"), once=True,
+    )
+
+
+def _in_use(text, lang):
+    """ ยังมีคำในเกมลากวาง / ข้อความคำตอบของเกมจับคู่ในภาษานี้ใช้ข้อความนี้อยู่หรือไม่ """
+    game_lang = Game.lang == lang
+    if lang == "en":
+        game_lang = db.or_(game_lang, Game.lang.is_(None))
+    for column, model in ((GameItem.correct_word, GameItem), (MatchingItem.answer_text, MatchingItem)):
+        used = (
+            db.session.query(model.id).join(Game, Game.id == model.game_id)
+            .filter(db.func.trim(column) == text, game_lang).first()
+        )
+        if used:
+            return True
+    return False
+
+
+def release(text, lang):
+    """
+    เรียกหลังแก้ / ลบข้อ (ก่อน commit): ถ้าข้อความเดิมไม่มีข้อไหนใช้แล้ว ลบเสียงของมันใน session ปัจจุบัน
+    (media_store ลบไฟล์ให้หลัง commit เมื่อไม่มีใครอ้างถึง)
+    """
+    text, lang = (text or "").strip(), lang or "en"
+    if not text:
+        return
+    clip = db.session.get(TtsClip, clip_key(text, lang))
+    if clip is not None and not _in_use(text, lang):
+        db.session.delete(clip)
+
+
+def clip_paths(texts, lang):
+    """ {ข้อความ: พาธเสียง} ของข้อความที่สร้างไว้แล้ว (query ครั้งเดียว) """
+    lang = lang or "en"
+    keys = {clip_key(t.strip(), lang): t for t in texts if t and t.strip()}
+    if not keys:
+        return {}
+    clips = TtsClip.query.filter(TtsClip.key.in_(list(keys))).all()
+    return {keys[c.key]: c.path for c in clips}
+
+
+def _texts():
+    """ (ข้อความ, ภาษา) ทั้งหมดที่ควรมีเสียง: คำของเกมลากวาง + ข้อความคำตอบของเกมจับคู่ """
+    rows = db.session.query(GameItem.correct_word, Game.lang).join(Game, Game.id == GameItem.game_id).all()
+    rows += db.session.query(MatchingItem.answer_text, Game.lang).join(Game, Game.id == MatchingItem.game_id).all()
+    return {((text or "").strip(), lang or "en") for text, lang in rows if text and text.strip()}
+
+
+def prerender_all():
+    """ สร้างเสียงที่ยังขาดของทุกข้อ คืน (จำนวนที่สร้างใหม่, จำนวนที่สร้างไม่ได้) """
+    created, failed = 0, 0
+    for text, lang in sorted(_texts()):
+        if db.session.get(TtsClip, clip_key(text, lang)) is not None:
+            continue
+        if prerender(text, lang):
+            db.session.commit()
+            created += 1
+        else:
+            failed += 1
+    return created, failed
+
+
+def prune():
+    """ ลบเสียงของข้อความที่ไม่มีข้อไหนใช้แล้ว (หรือสร้างด้วยเสียง / ความเร็วเดิม) คืนจำนวนที่ลบ """
+    wanted = {clip_key(text, lang) for text, lang in _texts()}
+    stale = [c for c in TtsClip.query.all() if c.key not in wanted]
+    for clip in stale:
+        db.session.delete(clip)
+    db.session.commit()
+    return len(stale)
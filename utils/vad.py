@@ -0,0 +1,58 @@
+import threading
+
+# สถิติรวมของ process: ตัดเงียบไปได้กี่วินาที / ปฏิเสธคลิปที่ไม่มีเสียงพูดกี่คลิป
+_stats = {"clips": 0, "rejected": 0, "capped": 0, "input_s": 0.0, "speech_s": 0.0}
+_stats_lock = threading.Lock()
+
+
+def trim_silence(audio, sr=16000, frame_ms=30, min_db=-45.0, margin_db=12.0,
+                 min_speech_ms=200, pad_ms=150, max_speech_s=None):
+    """
+    VAD แบบพลังงาน (energy) สำหรับตัดช่วงเงียบหัว-ท้ายก่อนส่งเข้า Whisper
+    - เกณฑ์ = max(min_db, ระดับเสียงพื้นหลัง + margin_db) → ปรับตามไมค์แต่ละเครื่อง
+      แต่ไม่เกิน ระดับช่วงดัง - margin_db (คลิปที่พูดเต็มคลิป ไม่มีช่วงเงียบให้วัดพื้นหลัง)
+    - คืน None ถ้าไม่มีเสียงพูดเลย (ไม่ต้องรันโมเดล)
+    - max_speech_s จำกัดความยาวเสียงพูดสูงสุดที่จะส่งต่อ
+    """
+    import numpy as np
+
+    frame = int(sr * frame_ms / 1000)
+    n = len(audio) // frame
+    result = None
+    if n:
+        frames = np.asarray(audio[:n * frame], dtype=np.float32).reshape(n, frame)
+        db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        floor, loud = np.percentile(db, [10, 90])
+        threshold = max(min_db, min(float(floor) + margin_db, float(loud) - margin_db))
+        voiced = np.flatnonzero(db > threshold)
+
+        if len(voiced) * frame_ms >= min_speech_ms:
+            pad = int(sr * pad_ms / 1000)
+            start = max(0, voiced[0] * frame - pad)
+            end = min(len(audio), (voiced[-1] + 1) * frame + pad)
+            result = audio[start:end]
+
+    capped = False
+    if result is not None and max_speech_s and len(result) > max_speech_s * sr:
+        result = result[:int(max_speech_s * sr)]
+        capped = True
+
+    with _stats_lock:
+        _stats["clips"] += 1
+        _stats["input_s"] += len(audio) / sr
+        if result is None:
+            _stats["rejected"] += 1
+        else:
+            _stats["speech_s"] += len(result) / sr
+            _stats["capped"] += capped
+    return result
+
+
+def vad_stats():
+    with _stats_lock:
+        s = dict(_stats)
+    s["trimmed_s"] = round(s["input_s"] - s["speech_s"], 2)
+    s["saved_ratio"] = round(1 - s["speech_s"] / s["input_s"], 3) if s["input_s"] else 0
+    s["input_s"] = round(s["input_s"], 2)
+    s["speech_s"] = round(s["speech_s"], 2)
+    return s